@@ -1,10 +1,14 @@
-from fastapi import FastAPI
+import os
+import logging
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse
 from typing import Dict, List
 
 from .routers import logs, runs
 # 导入新增的路由器
 from .routers import agents, workflow, analysis, api_runs, reports, config
+from .utils.response_cache import ResponseCacheMiddleware
 
 # Create FastAPI app instance
 app = FastAPI(
@@ -13,6 +17,17 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# 读多写少端点的进程内响应缓存，配置写入时自动失效
+# 先于 CORS 注册，使其位于 CORS 内层，缓存内容不包含按来源生成的 CORS 头
+# （/reports/ 列表已按 reports 目录 mtime 缓存，新报告写入后立即可见，不在此处按 TTL 缓存）
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache_paths={
+        "/api/config/get": 10,
+    },
+    drop_prefixes=["/api/config/"],
+)
+
 # Configure CORS (Cross-Origin Resource Sharing)
 # Allows requests from any origin in this example.
 # Adjust origins as needed for production environments.
@@ -26,6 +41,24 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# 性能分析：设置环境变量 PROFILING=true 后，任意请求附带 ?profile=1 即返回 pyinstrument 报告
+if os.getenv("PROFILING", "").lower() in ("1", "true", "yes"):
+    try:
+        from pyinstrument import Profiler
+
+        @app.middleware("http")
+        async def profile_request(request: Request, call_next):
+            if not request.query_params.get("profile"):
+                return await call_next(request)
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            await call_next(request)
+            profiler.stop()
+            return HTMLResponse(profiler.output_html())
+    except ImportError:
+        logging.getLogger("backend").warning(
+            "PROFILING is enabled but pyinstrument is not installed; profiling disabled")
+
 # 包含现有路由器
 app.include_router(logs.router)
 app.include_router(runs.router)
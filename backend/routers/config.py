@@ -5,24 +5,33 @@
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import os
 import logging
+from dataclasses import dataclass
 from typing import Optional
 
 from ..models.api_models import ApiResponse
+from ..utils.api_utils import build_api_response
 
 logger = logging.getLogger("config_router")
 
 # 创建路由器
-router = APIRouter(prefix="/api/config", tags=["Config"])
+router = APIRouter(prefix="/api/config", tags=["Config"],
+                   default_response_class=ORJSONResponse)
 
-# 内存中存储的配置（仅在运行时有效）
-_runtime_config = {
-    "OPENAI_COMPATIBLE_API_KEY": None,
-    "OPENAI_COMPATIBLE_BASE_URL": None,
-    "OPENAI_COMPATIBLE_MODEL": None,
-}
+
+@dataclass(slots=True)
+class RuntimeConfig:
+    """运行时配置（仅在运行时有效），写入时同步到环境变量供 LLM 客户端读取"""
+    api_key: Optional[str] = None
+    base_url: Optional[str] = None
+    model: Optional[str] = None
+
+
+# 内存中存储的配置
+_cfg = RuntimeConfig()
 
 
 class ConfigRequest(BaseModel):
@@ -41,18 +50,15 @@ async def set_config(request: ConfigRequest):
     """
     try:
         if request.api_key:
-            _runtime_config["OPENAI_COMPATIBLE_API_KEY"] = request.api_key
-            os.environ["OPENAI_COMPATIBLE_API_KEY"] = request.api_key
+            _cfg.api_key = os.environ["OPENAI_COMPATIBLE_API_KEY"] = request.api_key
             logger.info("OPENAI_COMPATIBLE_API_KEY has been set")
         
         if request.base_url:
-            _runtime_config["OPENAI_COMPATIBLE_BASE_URL"] = request.base_url
-            os.environ["OPENAI_COMPATIBLE_BASE_URL"] = request.base_url
+            _cfg.base_url = os.environ["OPENAI_COMPATIBLE_BASE_URL"] = request.base_url
             logger.info("OPENAI_COMPATIBLE_BASE_URL has been set")
         
         if request.model:
-            _runtime_config["OPENAI_COMPATIBLE_MODEL"] = request.model
-            os.environ["OPENAI_COMPATIBLE_MODEL"] = request.model
+            _cfg.model = os.environ["OPENAI_COMPATIBLE_MODEL"] = request.model
             logger.info("OPENAI_COMPATIBLE_MODEL has been set")
         
         return ApiResponse(
@@ -69,17 +75,17 @@ async def set_config(request: ConfigRequest):
         raise HTTPException(status_code=500, detail=f"Failed to set config: {str(e)}")
 
 
-@router.get("/get", response_model=ApiResponse[dict])
+@router.get("/get", responses={200: {"model": ApiResponse[dict]}})
 async def get_config():
     """获取当前系统配置
     
     返回当前设置的配置值（不包含敏感信息如 API Key 的完整值）
     """
     try:
-        # 从环境变量或运行时配置获取
-        api_key = os.getenv("OPENAI_COMPATIBLE_API_KEY") or _runtime_config.get("OPENAI_COMPATIBLE_API_KEY")
-        base_url = os.getenv("OPENAI_COMPATIBLE_BASE_URL") or _runtime_config.get("OPENAI_COMPATIBLE_BASE_URL")
-        model = os.getenv("OPENAI_COMPATIBLE_MODEL") or _runtime_config.get("OPENAI_COMPATIBLE_MODEL")
+        # 优先使用运行时配置（写入时已同步到环境变量），未设置时回退到 .env 加载的环境变量
+        api_key = _cfg.api_key or os.getenv("OPENAI_COMPATIBLE_API_KEY")
+        base_url = _cfg.base_url or os.getenv("OPENAI_COMPATIBLE_BASE_URL")
+        model = _cfg.model or os.getenv("OPENAI_COMPATIBLE_MODEL")
         
         # 隐藏 API Key 的敏感部分
         api_key_display = None
@@ -89,8 +95,7 @@ async def get_config():
             else:
                 api_key_display = "***"
         
-        return ApiResponse(
-            success=True,
+        return build_api_response(
             message="配置获取成功",
             data={
                 "api_key": api_key_display,
@@ -4,23 +4,35 @@
 此模块提供读取 reports 目录中历史报告文件的 API 端点
 """
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse
 import os
+import re
+import asyncio
 import logging
+import anyio
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
 from typing import List
 from datetime import datetime, UTC
 
 from ..models.api_models import ApiResponse
+from ..utils.api_utils import build_api_response
 
 logger = logging.getLogger("reports_router")
 
 # 创建路由器
-router = APIRouter(prefix="/reports", tags=["Reports"])
+router = APIRouter(prefix="/reports", tags=["Reports"],
+                   default_response_class=ORJSONResponse)
 
+# 报告列表缓存：以 reports 目录的 mtime 作为失效依据
+_cache = {"mtime": None, "data": None}
+_cache_lock = asyncio.Lock()
 
+
+@lru_cache(maxsize=1)
 def get_reports_dir():
-    """获取 reports 目录路径"""
+    """获取 reports 目录路径（仅依赖模块位置，进程内只计算一次）"""
     # 获取项目根目录
     current_file = os.path.abspath(__file__)
     backend_dir = os.path.dirname(os.path.dirname(current_file))
@@ -29,7 +41,68 @@ def get_reports_dir():
     return reports_dir
 
 
-@router.get("/", response_model=ApiResponse[List[dict]])
+# 合法报告文件名：以 .md 结尾，不包含路径分隔符、空字符和 ".."；
+# 报告名中含股票中文名（如 2025-12-11-600330-白云山.md），不能限制为 ASCII 字符
+_SAFE_FILENAME = re.compile(r'(?!.*\.\.)[^/\\\x00]+\.md')
+
+
+def _validate_filename(filename: str):
+    """校验报告文件名，防止路径遍历攻击并确保只访问 .md 文件"""
+    if not _SAFE_FILENAME.fullmatch(filename):
+        if filename.endswith('.md'):
+            raise HTTPException(status_code=400, detail="Invalid filename")
+        raise HTTPException(status_code=400, detail="Only .md files are allowed")
+
+
+def _scan_reports(reports_dir: str) -> List[dict]:
+    """扫描 reports 目录并解析报告文件名，按文件名倒序返回"""
+    reports = []
+    with os.scandir(reports_dir) as entries:
+        for entry in entries:
+            filename = entry.name
+            if filename.endswith('.md') and entry.is_file():
+                # 解析文件名格式: {ticker}_{date}.md
+                # 例如: 600330_20251211.md
+                ticker, _, date_str = filename[:-3].partition('_')
+                
+                reports.append({
+                    "filename": filename,
+                    "ticker": ticker,
+                    "date": date_str
+                })
+    
+    # 按文件名倒序排序（最新的在前）
+    reports.sort(key=lambda x: x["filename"], reverse=True)
+    return reports
+
+
+def _validator_headers(stat: os.stat_result) -> dict:
+    """根据文件状态生成 ETag 和 Last-Modified 响应头"""
+    return {
+        "ETag": f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+
+
+def _is_not_modified(request: Request, headers: dict, stat: os.stat_result) -> bool:
+    """判断客户端缓存是否仍然有效（If-None-Match 优先于 If-Modified-Since）"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in etags or headers["ETag"] in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(stat.st_mtime) <= since.timestamp()
+
+    return False
+
+
+@router.get("/", responses={200: {"model": ApiResponse[List[dict]]}})
 async def list_reports():
     """获取所有历史报告文件列表
     
@@ -40,34 +113,21 @@ async def list_reports():
         
         if not os.path.exists(reports_dir):
             logger.warning(f"Reports directory does not exist: {reports_dir}")
-            return ApiResponse(
-                success=True,
+            return build_api_response(
                 message="Reports directory does not exist",
                 data=[]
             )
         
-        reports = []
-        for filename in os.listdir(reports_dir):
-            if filename.endswith('.md'):
-                # 解析文件名格式: {ticker}_{date}.md
-                # 例如: 600330_20251211.md
-                name_without_ext = filename[:-3]  # 移除 .md
-                parts = name_without_ext.rsplit('_', 1)
-                
-                ticker = parts[0] if len(parts) > 0 else ''
-                date_str = parts[1] if len(parts) > 1 else ''
-                
-                reports.append({
-                    "filename": filename,
-                    "ticker": ticker,
-                    "date": date_str
-                })
-        
-        # 按文件名倒序排序（最新的在前）
-        reports.sort(key=lambda x: x["filename"], reverse=True)
+        mtime = os.stat(reports_dir).st_mtime_ns
+        if _cache["mtime"] != mtime:
+            async with _cache_lock:
+                # 获取锁后再次检查，避免并发请求重复扫描目录
+                if _cache["mtime"] != mtime:
+                    _cache["data"] = _scan_reports(reports_dir)
+                    _cache["mtime"] = mtime
+        reports = _cache["data"]
         
-        return ApiResponse(
-            success=True,
+        return build_api_response(
             message=f"Found {len(reports)} reports",
             data=reports
         )
@@ -77,20 +137,16 @@ async def list_reports():
 
 
 @router.get("/{filename}", response_model=ApiResponse[dict])
-async def get_report(filename: str):
+async def get_report(filename: str, request: Request, response: Response):
     """获取指定报告文件的内容
     
+    响应携带 ETag 和 Last-Modified 头，客户端缓存未过期时返回 304
+    
     参数:
     - filename: 报告文件名，例如: 600330_20251211.md
     """
     try:
-        # 安全检查：防止路径遍历攻击
-        if '..' in filename or '/' in filename or '\\' in filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
-        
-        # 确保文件名以 .md 结尾
-        if not filename.endswith('.md'):
-            raise HTTPException(status_code=400, detail="Only .md files are allowed")
+        _validate_filename(filename)
         
         reports_dir = get_reports_dir()
         file_path = os.path.join(reports_dir, filename)
@@ -98,10 +154,16 @@ async def get_report(filename: str):
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail=f"Report file not found: {filename}")
         
-        # 读取文件内容
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        stat = os.stat(file_path)
+        headers = _validator_headers(stat)
+        if _is_not_modified(request, headers, stat):
+            return Response(status_code=304, headers=headers)
+        
+        # 异步读取文件内容，避免磁盘 I/O 阻塞事件循环
+        async with await anyio.open_file(file_path, 'r', encoding='utf-8') as f:
+            content = await f.read()
         
+        response.headers.update(headers)
         return ApiResponse(
             success=True,
             message="Report retrieved successfully",
@@ -125,13 +187,7 @@ async def download_report(filename: str):
     - filename: 报告文件名，例如: 600330_20251211.md
     """
     try:
-        # 安全检查：防止路径遍历攻击
-        if '..' in filename or '/' in filename or '\\' in filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
-        
-        # 确保文件名以 .md 结尾
-        if not filename.endswith('.md'):
-            raise HTTPException(status_code=400, detail="Only .md files are allowed")
+        _validate_filename(filename)
         
         reports_dir = get_reports_dir()
         file_path = os.path.join(reports_dir, filename)
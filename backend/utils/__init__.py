@@ -8,7 +8,10 @@ from .api_utils import (
     serialize_for_api,
     safe_parse_json,
     format_llm_request,
-    format_llm_response
+    format_llm_response,
+    build_api_response
 )
 
 from .context_managers import workflow_run
+
+from .response_cache import ResponseCacheMiddleware
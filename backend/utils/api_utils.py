@@ -5,8 +5,11 @@ API工具函数模块
 """
 
 import json
+from datetime import datetime, UTC
 from typing import Any, Dict
 
+from fastapi.responses import ORJSONResponse
+
 
 def safe_parse_json(data):
     """
@@ -202,3 +205,16 @@ def format_llm_response(response_data: Any) -> Dict:
 
     # 处理字典或其他复杂对象
     return serialize_for_api(response_data)
+
+
+def build_api_response(data: Any = None, message: str = "操作成功", success: bool = True) -> ORJSONResponse:
+    """直接构建与 ApiResponse 字段一致的 JSON 响应
+
+    适用于服务端自行构造数据的热点端点，跳过 response_model 的校验与序列化
+    """
+    return ORJSONResponse({
+        "success": success,
+        "message": message,
+        "data": data,
+        "timestamp": datetime.now(UTC),
+    })
@@ -21,17 +21,16 @@ def workflow_run(run_id: str):
     with workflow_run(run_id):
         # 执行工作流
     """
-    logger.info(f"🔵 workflow_run 上下文管理器：注册运行 {run_id}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"🔵 workflow_run 上下文管理器：注册并开始运行 {run_id}", extra={"run_id": run_id})
     api_state.register_run(run_id)
-    logger.info(f"✅ workflow_run 上下文管理器：运行已注册 {run_id}")
     try:
-        logger.info(f"🟢 workflow_run 上下文管理器：进入 yield，准备执行工作流 {run_id}")
         yield
-        logger.info(f"🟡 workflow_run 上下文管理器：yield 返回，工作流执行完成 {run_id}")
         api_state.complete_run(run_id, "completed")
-        logger.info(f"✅ workflow_run 上下文管理器：运行状态已更新为 completed {run_id}")
+        logger.info(f"✅ workflow_run 上下文管理器：运行完成，状态 completed {run_id}",
+                    extra={"run_id": run_id, "status": "completed"})
     except Exception as e:
-        logger.error(f"❌ workflow_run 上下文管理器：捕获异常 {run_id}: {type(e).__name__}: {str(e)}")
         api_state.complete_run(run_id, "error")
-        logger.info(f"⚠️ workflow_run 上下文管理器：运行状态已更新为 error {run_id}")
+        logger.error(f"❌ workflow_run 上下文管理器：运行失败，状态 error {run_id}: {type(e).__name__}: {str(e)}",
+                     extra={"run_id": run_id, "status": "error"})
         raise
@@ -0,0 +1,87 @@
+"""
+响应缓存中间件模块
+
+提供进程内的路由级 GET 响应缓存，用于读多写少的端点
+"""
+
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("response_cache")
+
+
+class ResponseCacheMiddleware:
+    """
+    路由级响应缓存 ASGI 中间件
+
+    - cache_paths: {路径: 缓存秒数}，仅缓存这些路径上状态码为 200 的 GET 响应
+    - drop_prefixes: 非 GET 请求命中这些前缀时，清除同前缀下的缓存条目
+
+    用法:
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        cache_paths={"/api/config/get": 10},
+        drop_prefixes=["/api/config/"],
+    )
+    """
+
+    def __init__(self, app, cache_paths: Dict[str, float],
+                 drop_prefixes: Optional[Iterable[str]] = None):
+        self.app = app
+        self.cache_paths = dict(cache_paths)
+        self.drop_prefixes = tuple(drop_prefixes or ())
+        # (path, query_string) -> (过期时间, http.response.start 消息, 响应体)
+        self._store: Dict[Tuple[str, bytes], Tuple[float, dict, bytes]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            self._drop(path)
+            return
+
+        ttl = self.cache_paths.get(path)
+        if ttl is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = (path, scope.get("query_string", b""))
+        entry = self._store.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _, start_message, body = entry
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start_message = None
+        chunks: List[bytes] = []
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if (not message.get("more_body", False)
+                        and start_message is not None
+                        and start_message["status"] == 200):
+                    self._store[key] = (
+                        time.monotonic() + ttl, start_message, b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _drop(self, path: str):
+        """清除与写请求路径同前缀的缓存条目"""
+        for prefix in self.drop_prefixes:
+            if path.startswith(prefix):
+                stale = [key for key in self._store if key[0].startswith(prefix)]
+                for key in stale:
+                    del self._store[key]
+                if stale:
+                    logger.debug(f"Dropped {len(stale)} cached responses under {prefix}")
@@ -1,4 +1,6 @@
 import math
+from functools import lru_cache
+import numpy as np
 from langchain_core.messages import HumanMessage
 from src.utils.logging_config import setup_logger
 
@@ -6,7 +8,7 @@ from src.agents.state import AgentState, show_agent_reasoning, show_workflow_sta
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 from src.config.industry_valuation_params import classify_industry
 
-import json
+import orjson
 
 
 def _safe_val(v, default=0):
@@ -20,63 +22,144 @@ def _safe_val(v, default=0):
         pass
     return v
 
+
+# 非金融行业评分阈值：盈利能力、增长指标为"高于阈值"，估值比率为"低于阈值"
+PROFITABILITY_THRESHOLDS = np.array([0.12, 0.10, 0.08])  # ROE, Net Margin, Op Margin
+GROWTH_THRESHOLDS = np.array([0.10, 0.10, 0.10])  # Revenue, Earnings, Book Value Growth
+# A股市场阈值（更符合实际情况）：P/E < 30（从25提高到30），P/B < 5（从3提高到5），P/S < 3（从5降低到3，更保守）
+PRICE_RATIO_THRESHOLDS = np.array([30, 5, 3])
+
+
+def _count_above(values, thresholds):
+    """统计超过对应阈值的指标个数（None/nan 视为不满足）"""
+    return int(np.greater(np.array(values, dtype=np.float64), thresholds).sum())
+
+
+def _count_below(values, thresholds):
+    """统计低于对应阈值的指标个数（None/nan 视为不满足）"""
+    return int(np.less(np.array(values, dtype=np.float64), thresholds).sum())
+
+
+MISSING_DATA_NOTE = " (数据获取失败，请检查 API 连接)"
+
+
+def _fmt_pct(label, value):
+    """格式化百分比指标，0/None 显示为 N/A"""
+    return f"{label}: {value:.2%}" if value else f"{label}: N/A"
+
+
+def _fmt_num(label, value):
+    """格式化数值指标，0/None 显示为 N/A"""
+    return f"{label}: {value:.2f}" if value else f"{label}: N/A"
+
+
+# 财务指标不可用时的固定输出：各维度均为中性，整体中性、低置信度
+NO_DATA_MESSAGE_CONTENT = {
+    "signal": "neutral",
+    "confidence": "10%",
+    "reasoning": {
+        "profitability_signal": {
+            "signal": "neutral",
+            "details": "ROE: N/A, Net Margin: N/A, Op Margin: N/A" + MISSING_DATA_NOTE
+        },
+        "growth_signal": {
+            "signal": "neutral",
+            "details": "Revenue Growth: N/A, Earnings Growth: N/A" + MISSING_DATA_NOTE
+        },
+        "financial_health_signal": {
+            "signal": "neutral",
+            "details": "Current Ratio: N/A, D/E: N/A" + MISSING_DATA_NOTE
+        },
+        "price_ratios_signal": {
+            "signal": "neutral",
+            "details": "P/E: N/A, P/B: N/A, P/S: N/A" + MISSING_DATA_NOTE
+        },
+    }
+}
+NO_DATA_MESSAGE_JSON = orjson.dumps(NO_DATA_MESSAGE_CONTENT).decode()
+
+# 评分所读取的全部指标字段，作为 _score 缓存键的组成部分
+SCORED_METRIC_KEYS = (
+    "book_value_growth",
+    "current_ratio",
+    "debt_to_equity",
+    "earnings_growth",
+    "earnings_per_share",
+    "free_cash_flow_per_share",
+    "net_margin",
+    "operating_margin",
+    "pe_ratio",
+    "price_to_book",
+    "price_to_sales",
+    "return_on_equity",
+    "revenue_growth",
+)
+
+# 消息模板：每次调用通过 model_copy 替换 content，省去重复的模型校验
+FUNDAMENTALS_MESSAGE_TEMPLATE = HumanMessage(content="", name="fundamentals_agent")
+
 # 初始化 logger
 logger = setup_logger('fundamentals_agent')
 
-##### Fundamental Agent #####
 
+def _neutral_response(state: AgentState):
+    """财务指标不可用时直接返回预先构建的中性信号，跳过全部评分计算"""
+    message = FUNDAMENTALS_MESSAGE_TEMPLATE.model_copy(update={"content": NO_DATA_MESSAGE_JSON})
 
-@agent_endpoint("fundamentals", "基本面分析师，分析公司财务指标、盈利能力和增长潜力")
-def fundamentals_agent(state: AgentState):
+    if state["metadata"]["show_reasoning"]:
+        show_agent_reasoning(NO_DATA_MESSAGE_CONTENT, "Fundamental Analysis Agent")
+        state["metadata"]["agent_reasoning"] = NO_DATA_MESSAGE_CONTENT
+
+    show_workflow_status("Fundamentals Analyst", "completed")
+    return {
+        "messages": [message],
+        "data": {
+            **state["data"],
+            "fundamental_analysis": NO_DATA_MESSAGE_CONTENT
+        },
+        "metadata": state["metadata"],
+    }
+
+
+@lru_cache(maxsize=256)
+def _score(metrics_items: tuple, is_finance: bool):
     """
-    基本面分析代理
-    
-    基于A股市场特点优化：
-    1. 盈利能力阈值：ROE > 12%, Net Margin > 10%, Op Margin > 8%（更符合A股实际情况）
-    2. 增长指标阈值：Revenue/Earnings/Book Value Growth > 10%（保持合理）
-    3. 财务健康阈值：Current Ratio > 1.2, Debt-to-Equity < 60%（更符合A股杠杆水平）
-    4. 估值比率阈值：P/E < 30, P/B < 5, P/S < 3（更符合A股估值水平）
-    
-    本地计算：
-    - 评分计算（profitability_score, growth_score, health_score, price_ratio_score）
-    - 综合信号判断（基于各维度评分）
-    - 置信度计算（基于信号一致性）
+    根据财务指标计算各维度信号、综合信号和置信度
+
+    以 (指标名, 值) 元组为键缓存结果，相同指标重复评估时直接复用。
+    返回的 message_content 为缓存共享对象，调用方不应修改。
+
+    Returns:
+        (message_content, message_content 的 JSON 字符串)
     """
-    show_workflow_status("Fundamentals Analyst")
-    show_reasoning = state["metadata"]["show_reasoning"]
-    data = state["data"]
-    
-    # 检查财务指标数据是否可用
-    financial_metrics_list = data.get("financial_metrics", [])
-    if not financial_metrics_list or len(financial_metrics_list) == 0:
-        logger.warning("⚠️ 财务指标数据不可用（可能 API 调用失败）")
-        metrics = {}
-    else:
-        metrics = financial_metrics_list[0]
-        # 检查 metrics 是否为空字典
-        if not metrics or len(metrics) == 0:
-            logger.warning("⚠️ 财务指标数据为空字典（可能 API 调用失败）")
-            metrics = {}
+    metrics = dict(metrics_items)
 
     # Initialize signals list for different fundamental aspects
     signals = []
     reasoning = {}
 
-    # 检测是否为金融行业
-    industry_name = data.get("industry", "")
-    industry_code = classify_industry(industry_name)
-    is_finance = (industry_code == "finance")
+    # 一次性读取所需指标，后续评分与文案复用这些局部变量
+    raw_roe = metrics.get("return_on_equity")
+    raw_net_margin = metrics.get("net_margin")
+    raw_operating_margin = metrics.get("operating_margin")
+    raw_revenue_growth = metrics.get("revenue_growth")
+    raw_earnings_growth = metrics.get("earnings_growth")
+    raw_current_ratio = metrics.get("current_ratio")
+    raw_debt_to_equity = metrics.get("debt_to_equity")
+    pe_ratio = metrics.get("pe_ratio", 0)
+    price_to_book = metrics.get("price_to_book", 0)
+    price_to_sales = metrics.get("price_to_sales", 0)
 
     # 1. Profitability Analysis
-    return_on_equity = _safe_val(metrics.get("return_on_equity"))
-    net_margin = _safe_val(metrics.get("net_margin"))
-    operating_margin = _safe_val(metrics.get("operating_margin"))
+    return_on_equity = _safe_val(raw_roe)
+    net_margin = _safe_val(raw_net_margin)
+    operating_margin = _safe_val(raw_operating_margin)
 
     if is_finance:
         # 金融公司：net_margin/operating_margin 通常为 nan，用 P/E 和 P/B 辅助判断
         # ROE 已在数据源层面做了年化处理（使用上年年报ROE或简单年化）
-        pe_ratio_val = _safe_val(metrics.get("pe_ratio"))
-        pb_ratio_val = _safe_val(metrics.get("price_to_book"))
+        pe_ratio_val = _safe_val(pe_ratio)
+        pb_ratio_val = _safe_val(price_to_book)
 
         profitability_score = 0
         if return_on_equity > 0.10:
@@ -92,34 +175,27 @@ def fundamentals_agent(state: AgentState):
             "details": f"ROE: {return_on_equity:.2%}, P/E: {pe_ratio_val:.2f}, P/B: {pb_ratio_val:.2f} (金融行业)"
         }
     else:
-        thresholds = [
-            (return_on_equity, 0.12),
-            (net_margin, 0.10),
-            (operating_margin, 0.08)
-        ]
-        profitability_score = sum(
-            metric is not None and metric > threshold
-            for metric, threshold in thresholds
-        )
+        profitability_score = _count_above(
+            [return_on_equity, net_margin, operating_margin],
+            PROFITABILITY_THRESHOLDS)
 
         signals.append('bullish' if profitability_score >=
                        2 else 'bearish' if profitability_score == 0 else 'neutral')
-        has_data = any(metrics.get(key) is not None for key in ['return_on_equity', 'net_margin', 'operating_margin'])
+        has_data = (raw_roe is not None or raw_net_margin is not None
+                    or raw_operating_margin is not None)
 
         reasoning["profitability_signal"] = {
             "signal": signals[0],
-            "details": (
-                f"ROE: {return_on_equity:.2%}" if return_on_equity else "ROE: N/A"
-            ) + ", " + (
-                f"Net Margin: {net_margin:.2%}" if net_margin else "Net Margin: N/A"
-            ) + ", " + (
-                f"Op Margin: {operating_margin:.2%}" if operating_margin else "Op Margin: N/A"
-            ) + (" (数据获取失败，请检查 API 连接)" if not has_data else "")
+            "details": ", ".join((
+                _fmt_pct("ROE", return_on_equity),
+                _fmt_pct("Net Margin", net_margin),
+                _fmt_pct("Op Margin", operating_margin),
+            )) + ("" if has_data else MISSING_DATA_NOTE)
         }
 
     # 2. Growth Analysis
-    revenue_growth = _safe_val(metrics.get("revenue_growth"))
-    earnings_growth = _safe_val(metrics.get("earnings_growth"))
+    revenue_growth = _safe_val(raw_revenue_growth)
+    earnings_growth = _safe_val(raw_earnings_growth)
     book_value_growth = _safe_val(metrics.get("book_value_growth"))
 
     if is_finance:
@@ -138,32 +214,25 @@ def fundamentals_agent(state: AgentState):
             "details": f"Earnings Growth: {earnings_growth:.2%}, Book Value Growth: {book_value_growth:.2%} (金融行业)"
         }
     else:
-        thresholds = [
-            (revenue_growth, 0.10),
-            (earnings_growth, 0.10),
-            (book_value_growth, 0.10)
-        ]
-        growth_score = sum(
-            metric is not None and metric > threshold
-            for metric, threshold in thresholds
-        )
+        growth_score = _count_above(
+            [revenue_growth, earnings_growth, book_value_growth],
+            GROWTH_THRESHOLDS)
 
         signals.append('bullish' if growth_score >=
                        2 else 'bearish' if growth_score == 0 else 'neutral')
-        has_growth_data = any(metrics.get(key) is not None for key in ['revenue_growth', 'earnings_growth'])
+        has_growth_data = raw_revenue_growth is not None or raw_earnings_growth is not None
 
         reasoning["growth_signal"] = {
             "signal": signals[1],
-            "details": (
-                f"Revenue Growth: {revenue_growth:.2%}" if revenue_growth else "Revenue Growth: N/A"
-            ) + ", " + (
-                f"Earnings Growth: {earnings_growth:.2%}" if earnings_growth else "Earnings Growth: N/A"
-            ) + (" (数据获取失败，请检查 API 连接)" if not has_growth_data else "")
+            "details": ", ".join((
+                _fmt_pct("Revenue Growth", revenue_growth),
+                _fmt_pct("Earnings Growth", earnings_growth),
+            )) + ("" if has_growth_data else MISSING_DATA_NOTE)
         }
 
     # 3. Financial Health
-    current_ratio = _safe_val(metrics.get("current_ratio"))
-    debt_to_equity = _safe_val(metrics.get("debt_to_equity"))
+    current_ratio = _safe_val(raw_current_ratio)
+    debt_to_equity = _safe_val(raw_debt_to_equity)
     free_cash_flow_per_share = _safe_val(metrics.get("free_cash_flow_per_share"))
     earnings_per_share = _safe_val(metrics.get("earnings_per_share"))
 
@@ -194,48 +263,34 @@ def fundamentals_agent(state: AgentState):
 
         signals.append('bullish' if health_score >=
                        2 else 'bearish' if health_score == 0 else 'neutral')
-        has_health_data = any(metrics.get(key) is not None for key in ['current_ratio', 'debt_to_equity'])
+        has_health_data = raw_current_ratio is not None or raw_debt_to_equity is not None
 
         reasoning["financial_health_signal"] = {
             "signal": signals[2],
-            "details": (
-                f"Current Ratio: {current_ratio:.2f}" if current_ratio else "Current Ratio: N/A"
-            ) + ", " + (
-                f"D/E: {debt_to_equity:.2f}" if debt_to_equity else "D/E: N/A"
-            ) + (" (数据获取失败，请检查 API 连接)" if not has_health_data else "")
+            "details": ", ".join((
+                _fmt_num("Current Ratio", current_ratio),
+                _fmt_num("D/E", debt_to_equity),
+            )) + ("" if has_health_data else MISSING_DATA_NOTE)
         }
 
     # 4. Price to X ratios
     # 基于A股市场特点优化估值比率阈值
     # A股市场特点：整体估值水平低于成熟市场，但部分成长股估值可能较高
-    pe_ratio = metrics.get("pe_ratio", 0)
-    price_to_book = metrics.get("price_to_book", 0)
-    price_to_sales = metrics.get("price_to_sales", 0)
-
-    # A股市场阈值（更符合实际情况）
-    thresholds = [
-        (pe_ratio, 30),  # A股市场P/E < 30就算合理（从25提高到30）
-        (price_to_book, 5),  # A股市场P/B < 5就算合理（从3提高到5）
-        (price_to_sales, 3)  # A股市场P/S < 3就算合理（从5降低到3，更保守）
-    ]
-    price_ratio_score = sum(
-        metric is not None and metric < threshold
-        for metric, threshold in thresholds
-    )
+    price_ratio_score = _count_below(
+        [pe_ratio, price_to_book, price_to_sales],
+        PRICE_RATIO_THRESHOLDS)
 
     signals.append('bullish' if price_ratio_score >=
                    2 else 'bearish' if price_ratio_score == 0 else 'neutral')
-    has_valuation_data = any([pe_ratio, price_to_book, price_to_sales])
+    has_valuation_data = bool(pe_ratio or price_to_book or price_to_sales)
     
     reasoning["price_ratios_signal"] = {
         "signal": signals[3],
-        "details": (
-            f"P/E: {pe_ratio:.2f}" if pe_ratio else "P/E: N/A"
-        ) + ", " + (
-            f"P/B: {price_to_book:.2f}" if price_to_book else "P/B: N/A"
-        ) + ", " + (
-            f"P/S: {price_to_sales:.2f}" if price_to_sales else "P/S: N/A"
-        ) + (" (数据获取失败，请检查 API 连接)" if not has_valuation_data else "")
+        "details": ", ".join((
+            _fmt_num("P/E", pe_ratio),
+            _fmt_num("P/B", price_to_book),
+            _fmt_num("P/S", price_to_sales),
+        )) + ("" if has_valuation_data else MISSING_DATA_NOTE)
     }
 
     # Determine overall signal
@@ -276,11 +331,57 @@ def fundamentals_agent(state: AgentState):
         "reasoning": reasoning
     }
 
+    return message_content, orjson.dumps(message_content).decode()
+
+
+##### Fundamental Agent #####
+
+
+@agent_endpoint("fundamentals", "基本面分析师，分析公司财务指标、盈利能力和增长潜力")
+def fundamentals_agent(state: AgentState):
+    """
+    基本面分析代理
+    
+    基于A股市场特点优化：
+    1. 盈利能力阈值：ROE > 12%, Net Margin > 10%, Op Margin > 8%（更符合A股实际情况）
+    2. 增长指标阈值：Revenue/Earnings/Book Value Growth > 10%（保持合理）
+    3. 财务健康阈值：Current Ratio > 1.2, Debt-to-Equity < 60%（更符合A股杠杆水平）
+    4. 估值比率阈值：P/E < 30, P/B < 5, P/S < 3（更符合A股估值水平）
+    
+    本地计算：
+    - 评分计算（profitability_score, growth_score, health_score, price_ratio_score）
+    - 综合信号判断（基于各维度评分）
+    - 置信度计算（基于信号一致性）
+    """
+    show_workflow_status("Fundamentals Analyst")
+    show_reasoning = state["metadata"]["show_reasoning"]
+    data = state["data"]
+    
+    # 检查财务指标数据是否可用
+    financial_metrics_list = data.get("financial_metrics", [])
+    if not financial_metrics_list or len(financial_metrics_list) == 0:
+        logger.warning("⚠️ 财务指标数据不可用（可能 API 调用失败）")
+        metrics = {}
+    else:
+        metrics = financial_metrics_list[0]
+        # 检查 metrics 是否为空字典
+        if not metrics or len(metrics) == 0:
+            logger.warning("⚠️ 财务指标数据为空字典（可能 API 调用失败）")
+            metrics = {}
+
+    if not metrics:
+        return _neutral_response(state)
+
+    # 检测是否为金融行业
+    industry_name = data.get("industry", "")
+    industry_code = classify_industry(industry_name)
+    is_finance = (industry_code == "finance")
+
+    metrics_items = tuple((key, metrics[key]) for key in SCORED_METRIC_KEYS if key in metrics)
+    message_content, payload = _score(metrics_items, is_finance)
+
     # Create the fundamental analysis message
-    message = HumanMessage(
-        content=json.dumps(message_content),
-        name="fundamentals_agent",
-    )
+    message = FUNDAMENTALS_MESSAGE_TEMPLATE.model_copy(update={"content": payload})
 
     # Print the reasoning if the flag is set
     if show_reasoning:
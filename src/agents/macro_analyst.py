@@ -4,12 +4,16 @@ from src.tools.news_crawler import get_stock_news
 from src.utils.logging_config import setup_logger
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 import json
+import re
 from datetime import datetime, timedelta
 from src.tools.openrouter_config import get_chat_completion
 
 # 设置日志记录
 logger = setup_logger('macro_analyst_agent')
 
+# 预编译的代码块提取正则
+_JSON_FENCE_RE = re.compile(r'```json\s*(.*?)\s*```', re.DOTALL)
+
 
 @agent_endpoint("macro_analyst", "宏观分析师，分析宏观经济环境对目标股票的影响")
 def macro_analyst_agent(state: AgentState):
@@ -189,8 +193,7 @@ def get_macro_news_analysis(news_list: list) -> dict:
             logger.info("成功解析LLM返回的JSON结果")
         except json.JSONDecodeError:
             # 如果直接解析失败，尝试提取JSON部分
-            import re
-            json_match = re.search(r'```json\s*(.*?)\s*```', result, re.DOTALL)
+            json_match = _JSON_FENCE_RE.search(result)
             if json_match:
                 try:
                     analysis_result = json.loads(json_match.group(1).strip())
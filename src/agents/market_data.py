@@ -5,6 +5,7 @@ from src.tools.api import get_financial_metrics, get_financial_statements, get_m
 from src.utils.logging_config import setup_logger
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pandas as pd
 
@@ -42,8 +43,15 @@ def market_data_agent(state: AgentState):
     # Get all required data
     ticker = data["ticker"]
 
+    # 四类数据相互独立，并发获取以缩短等待时间（Baostock 查询在 api 模块内部串行化）
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        prices_future = executor.submit(get_price_history, ticker, start_date, end_date)
+        metrics_future = executor.submit(get_financial_metrics, ticker)
+        statements_future = executor.submit(get_financial_statements, ticker)
+        market_future = executor.submit(get_market_data, ticker)
+
     # 获取价格数据并验证
-    prices_df = get_price_history(ticker, start_date, end_date)
+    prices_df = prices_future.result()
     if prices_df is None or prices_df.empty:
         logger.warning(f"警告：无法获取{ticker}的价格数据，将使用空数据继续")
         prices_df = pd.DataFrame(
@@ -51,21 +59,21 @@ def market_data_agent(state: AgentState):
 
     # 获取财务指标
     try:
-        financial_metrics = get_financial_metrics(ticker)
+        financial_metrics = metrics_future.result()
     except Exception as e:
         logger.error(f"获取财务指标失败: {str(e)}")
         financial_metrics = {}
 
     # 获取财务报表
     try:
-        financial_line_items = get_financial_statements(ticker)
+        financial_line_items = statements_future.result()
     except Exception as e:
         logger.error(f"获取财务报表失败: {str(e)}")
         financial_line_items = {}
 
     # 获取市场数据
     try:
-        market_data = get_market_data(ticker)
+        market_data = market_future.result()
     except Exception as e:
         logger.error(f"获取市场数据失败: {str(e)}")
         market_data = {"market_cap": 0}
@@ -75,8 +83,9 @@ def market_data_agent(state: AgentState):
         prices_df = pd.DataFrame(
             columns=['close', 'open', 'high', 'low', 'volume'])
 
-    # 转换价格数据为字典格式
-    prices_dict = prices_df.to_dict('records')
+    # 转换价格数据为列式字典（列名 -> 值列表），避免为每一行单独创建字典；
+    # 下游通过 prices_to_df 直接还原为 DataFrame
+    prices_dict = prices_df.to_dict('list')
 
     # 获取股票名称和行业
     stock_name = market_data.get("stock_name", "")
@@ -110,7 +119,7 @@ def market_data_agent(state: AgentState):
         "start_date": start_date,
         "end_date": end_date,
         "data_collected": {
-            "price_history": len(prices_dict) > 0,
+            "price_history": not prices_df.empty,
             "financial_metrics": len(financial_metrics) > 0,
             "financial_statements": len(financial_line_items) > 0,
             "market_data": len(market_data) > 0
@@ -1,30 +1,197 @@
 from langchain_core.messages import HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
+import hashlib
 import json
-import re
+import logging
+import orjson
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Literal, Union
+
+from pydantic import AliasChoices, BaseModel, Field, ValidationError, field_validator
 from src.utils.logging_config import setup_logger
 
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
 from src.tools.openrouter_config import get_chat_completion
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
+from src.utils.portfolio_report import parse_llm_json_response
 
 # 初始化 logger
 logger = setup_logger('portfolio_management_agent')
 
 ##### Portfolio Management Agent #####
 
-# Helper function to get the latest message by agent name
+# 静态 system prompt：不做任何插值，保证每次请求的前缀逐字节一致，便于服务端前缀缓存命中
+_SYSTEM_PROMPT = """You are a portfolio manager making final trading decisions.
+            Your job is to make a trading decision based on the team's analysis while strictly adhering
+            to risk management constraints.
+
+            RISK MANAGEMENT CONSTRAINTS:
+            - You MUST NOT exceed the max_shares (in shares) specified by the risk manager
+            - max_position_size_yuan is the max position value in RMB; max_shares is already calculated as max_position_size_yuan / current_price, rounded down to nearest 100 (A-share lot size)
+            - You MUST follow the trading_action (buy/sell/hold) recommended by risk management
+            - These are hard constraints that cannot be overridden by other signals
+
+            When weighing the different signals for direction and timing (adjusted for A-share market characteristics):
+            1. Macro Analysis (25% weight) - This encompasses TWO inputs:
+               a) General Macro Environment (from Macro Analyst Agent, tool-based)
+               b) Daily Market-Wide News Summary (from Macro News Agent)
+               Both provide context for external risks and opportunities.
+               NOTE: A-share market is highly policy-driven, so macro analysis has the highest weight.
+            2. Technical Analysis (25% weight)
+               NOTE: A-share market is dominated by retail investors, making technical patterns more effective.
+            3. Fundamental Analysis (20% weight)
+               NOTE: Fundamentals provide important insights into company quality, profitability, growth, and financial health.
+            4. Valuation Analysis (15% weight)
+               NOTE: Valuation models have limitations in A-share market due to high volatility, policy influence, and model assumptions. Lower weight reflects these limitations.
+            5. Sentiment Analysis (15% weight)
+               NOTE: Market sentiment and fund flows significantly impact A-share market due to retail investor dominance.
+
+            The decision process should be (prioritized for A-share market):
+            1. First check risk management constraints
+            2. Evaluate BOTH the General Macro Environment AND the Daily Market-Wide News Summary (highest priority - policy-driven market)
+            3. Use technical analysis for entry/exit timing (high priority - retail investor behavior)
+            4. Evaluate fundamentals signal (company quality, profitability, growth, financial health)
+            5. Consider sentiment for market mood and fund flow assessment (moderate priority)
+            6. Finally evaluate valuation signal (reference only, as models have limitations)
+
+            Provide the following in your output JSON:
+            - "action": "buy" | "sell" | "hold",
+            - "quantity": <positive integer>
+            - "confidence": <float between 0 and 1>
+            - "agent_signals": <list of agent signals including agent name, signal (bullish | bearish | neutral), and their confidence>.
+              IMPORTANT: Your 'agent_signals' list MUST include entries for:
+                - "technical_analysis"
+                - "fundamental_analysis"
+                - "sentiment_analysis"
+                - "valuation_analysis"
+                - "risk_management"
+                - "selected_stock_macro_analysis" (representing the tool-based macro input from macro_analyst_agent)
+                - "market_wide_news_summary(沪深300指数)" (representing the daily news summary input from macro_news_agent - provide a brief signal like bullish/bearish/neutral for the news summary itself, or state if it was primarily factored into overall reasoning with confidence reflecting its impact)
+            - "reasoning": <concise explanation of the decision including how you weighted ALL signals, including both macro inputs (in English)>
+            - "reasoning_zh": <same explanation as 'reasoning' but translated into Chinese (中文)>
+
+            Trading Rules:
+            - Never exceed risk management position limits
+            - Only buy if you have available cash
+            - Only sell if you have shares to sell
+            - Quantity must be ≤ current position for sells
+            - Quantity (in shares) must be ≤ max_shares from risk management
+            - Quantity must be a multiple of 100 (A-share lot size)"""
+# 只读约定：各次调用共享同一个 dict，不要修改
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": _SYSTEM_PROMPT
+}
+_SYSTEM_PROMPT_SHA256 = hashlib.sha256(_SYSTEM_PROMPT.encode("utf-8")).hexdigest()
+logger.debug("portfolio_management system prompt sha256: %s", _SYSTEM_PROMPT_SHA256)
+
+# user prompt 的静态部分，每次调用只填入动态字段
+_USER_PROMPT_TEMPLATE = """Based on the team's analysis below, make your trading decision.
+
+            Team Signals (JSON, keyed by agent_signals name; selected_stock_macro_analysis is the General Macro Analysis from Macro Analyst Agent):
+            {team_signals_payload}
+            Daily Market-Wide News Summary (from Macro News Agent):
+            {market_wide_news_summary_content}
+
+            Current Portfolio:
+            Cash: {cash:.2f}
+            Current Position: {stock} shares
+
+            Output JSON only. Ensure 'agent_signals' includes all required agents as per system prompt."""
 
 
-def get_latest_message_by_name(messages: list, name: str):
-    for msg in reversed(messages):
-        if msg.name == name:
-            return msg
-    logger.warning(
-        f"Message from agent '{name}' not found in portfolio_management_agent.")
-    # Return a dummy message object or raise an error, depending on desired handling
-    # For now, returning a dummy message to avoid crashing, but content will be None.
-    return HumanMessage(content=json.dumps({"signal": "error", "details": f"Message from {name} not found"}), name=name)
+class AgentSignal(BaseModel):
+    """最终决策中单个 agent 的信号"""
+    # LLM 可能返回 'agent' 或 'agent_name'
+    agent_name: str = Field(validation_alias=AliasChoices("agent_name", "agent"))
+    signal: str
+    confidence: Union[float, str] = 0.0
+
+
+class PortfolioDecision(BaseModel):
+    """投资组合经理输出的交易决策，同时作为 LLM 结构化输出的 schema"""
+    action: Literal["buy", "sell", "hold"]
+    quantity: int
+    confidence: Union[float, str]
+    agent_signals: List[AgentSignal]
+    reasoning: str
+    reasoning_zh: str = ""
+
+    @field_validator("action", mode="before")
+    @classmethod
+    def _lower_action(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+
+_DECISION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "portfolio_decision",
+        "schema": PortfolioDecision.model_json_schema(),
+    },
+}
+# 输出不符合 schema 时，带上校验错误重新请求的次数
+_DECISION_MAX_RETRIES = 2
+
+# 执行主要逻辑前必须已经到达的上游消息
+_REQUIRED_AGENTS = ("macro_analyst_agent", "risk_management_agent")
+
+# 按输入哈希缓存最终决策，输入完全相同的重复运行直接复用，跳过 LLM 调用：
+# 进程内 LRU 为第一层，磁盘文件为第二层（跨进程/重启后仍可命中）。
+# 磁盘缓存目录按模块位置解析，与工作目录无关；文件数量和有效期均有上限
+_DECISION_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "portfolio_decision_cache")
+_DECISION_CACHE_MAX_FILES = 256
+_DECISION_CACHE_TTL = 7 * 24 * 3600  # 秒
+_DECISION_MEMORY_CACHE_SIZE = 64
+_decision_memory_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_decision_memory_lock = threading.Lock()
+
+# LLM 调用失败时使用的默认保守决策（结构与正常输出的 agent_signals 保持一致），导入时序列化一次
+_DEFAULT_LLM_FAILURE_JSON = orjson.dumps({
+    "action": "hold",
+    "quantity": 0,
+    "confidence": 0.7,
+    "agent_signals": [
+        {"agent_name": "technical_analysis",
+            "signal": "neutral", "confidence": 0.0},
+        {"agent_name": "fundamental_analysis",
+            "signal": "neutral", "confidence": 0.0},
+        {"agent_name": "sentiment_analysis",
+            "signal": "neutral", "confidence": 0.0},
+        {"agent_name": "valuation_analysis",
+            "signal": "neutral", "confidence": 0.0},
+        {"agent_name": "risk_management",
+            "signal": "hold", "confidence": 1.0},
+        {"agent_name": "macro_analyst_agent",
+            "signal": "neutral", "confidence": 0.0},
+        {"agent_name": "macro_news_agent",
+            "signal": "unavailable_or_llm_error", "confidence": 0.0}
+    ],
+    "reasoning": "LLM API error. Defaulting to conservative hold based on risk management.",
+    "reasoning_zh": "LLM API 错误。基于风险管理，默认采取保守的持有策略。"
+}).decode()
+
+
+@lru_cache(maxsize=128)
+def _loads_message_content(content: str):
+    """按内容缓存的 JSON 解析，解析失败返回 None
+
+    优先使用 orjson；orjson 不接受 NaN/Infinity（技术分析等 agent 用 json.dumps 输出时可能出现），
+    遇到这类内容时交给标准库再解析一次。
+    返回的对象在多次调用间共享，调用方只读取不修改。
+    """
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            return None
 
 
 def parse_agent_message_content(content: str, agent_name: str = "unknown") -> dict:
@@ -40,18 +207,27 @@ def parse_agent_message_content(content: str, agent_name: str = "unknown") -> di
     if not content:
         return {}
     
-    # 尝试解析为 JSON
-    try:
-        if isinstance(content, str):
-            return json.loads(content)
-        elif isinstance(content, dict):
-            return content
-        else:
-            return {}
-    except (json.JSONDecodeError, TypeError):
+    if isinstance(content, dict):
+        return content
+    if not isinstance(content, str):
+        return {}
+    
+    # 尝试解析为 JSON（同一内容重复进入时直接命中缓存）
+    parsed = _loads_message_content(content)
+    if parsed is None:
         # 如果不是 JSON，返回包含原始内容的字典
-        logger.debug(f"{agent_name} 消息不是 JSON 格式，返回原始内容")
+        logger.debug("%s 消息不是 JSON 格式，返回原始内容", agent_name)
         return {"raw_content": content}
+    return parsed
+
+
+# 日志与决策详情中原始响应片段的最大长度
+_MAX_SNIPPET = 500
+
+
+def _snip(text: str, limit: int = _MAX_SNIPPET) -> str:
+    """截取片段，仅在确实被截断时追加省略号，未超长时直接返回原字符串"""
+    return text if len(text) <= limit else f"{text[:limit]}..."
 
 
 def normalize_confidence(confidence_value) -> float:
@@ -69,108 +245,236 @@ def normalize_confidence(confidence_value) -> float:
     Returns:
         标准化后的浮点数 (0-1)
     """
+    # 快速路径：上游 agent 通常直接给出 0-1 之间的 float
+    value_type = type(confidence_value)
+    if value_type is float or value_type is int:
+        # 如果大于1，假设是百分比形式
+        return confidence_value / 100.0 if confidence_value > 1.0 else float(confidence_value)
+    
     if confidence_value is None:
         return 0.0
     
-    if isinstance(confidence_value, (int, float)):
-        # 如果是数字，检查是否大于1（可能是百分比形式）
-        if confidence_value > 1.0:
-            return confidence_value / 100.0
-        return float(confidence_value)
-    
     if isinstance(confidence_value, str):
-        # 移除空格和百分号
-        cleaned = confidence_value.strip().replace('%', '')
+        # 移除空格和百分号（无百分号时不再额外分配字符串）
+        cleaned = confidence_value.strip()
+        if '%' in cleaned:
+            cleaned = cleaned.replace('%', '')
         try:
             value = float(cleaned)
-            # 如果大于1，假设是百分比形式
-            if value > 1.0:
-                return value / 100.0
-            return value
         except ValueError:
             logger.warning(f"无法解析 confidence 值: {confidence_value}")
             return 0.0
+        # 如果大于1，假设是百分比形式
+        return value / 100.0 if value > 1.0 else value
+    
+    # 其他数值类型（如 numpy 标量、bool）
+    if isinstance(confidence_value, (int, float)):
+        return confidence_value / 100.0 if confidence_value > 1.0 else float(confidence_value)
     
     return 0.0
 
 
-def parse_llm_json_response(response: str) -> dict:
-    """解析 LLM 返回的 JSON 响应，处理 markdown 代码块和额外文本
-    
-    Args:
-        response: LLM 返回的原始响应字符串
-        
-    Returns:
-        解析后的 JSON 字典
-        
+def normalize_confidences(*confidence_values) -> tuple:
+    """批量标准化多个 agent 的 confidence，并截断到 [0, 1]
+
+    数值直接在一次遍历中完成百分比换算，字符串等其他类型回退到 normalize_confidence。
+    """
+    return tuple(
+        min(max(value / 100.0 if value > 1.0 else float(value), 0.0), 1.0)
+        if type(value) is float or type(value) is int
+        else min(max(normalize_confidence(value), 0.0), 1.0)
+        for value in confidence_values
+    )
+
+
+def _validate_decision(content: str) -> PortfolioDecision:
+    """校验 LLM 响应是否符合决策 schema
+
     Raises:
-        json.JSONDecodeError: 如果无法解析为有效的 JSON
+        json.JSONDecodeError / ValidationError: 无法解析或不符合 schema
     """
-    if not response:
-        raise json.JSONDecodeError("Empty response", response, 0)
-    
-    # 清理响应
-    cleaned_response = response.strip()
-    
-    # 方法1: 尝试直接解析
     try:
-        return json.loads(cleaned_response)
-    except json.JSONDecodeError:
+        return PortfolioDecision.model_validate_json(content)
+    except ValidationError:
+        # 结构化输出不被支持时，响应可能仍包裹在代码块或说明文字中
+        return PortfolioDecision.model_validate(parse_llm_json_response(content))
+
+
+def _decision_cache_key(*fields: str) -> str:
+    """计算决策缓存键：各字段前置 8 字节长度后依次计入 sha256，避免拼接歧义"""
+    key = hashlib.sha256()
+    for field in fields:
+        data = field.encode("utf-8")
+        key.update(struct.pack("<Q", len(data)))
+        key.update(data)
+    return key.hexdigest()
+
+
+def _remove_cache_file(cache_file: str):
+    """删除决策缓存文件；文件可能已被并发运行删除，删除失败只记录日志"""
+    try:
+        os.remove(cache_file)
+    except FileNotFoundError:
         pass
-    
-    # 方法2: 尝试提取 markdown 代码块中的 JSON
-    # 匹配 ```json ... ``` 或 ``` ... ```
-    json_block_patterns = [
-        r'```json\s*(.*?)\s*```',  # ```json ... ```
-        r'```\s*(.*?)\s*```',       # ``` ... ```
+    except OSError as e:
+        logger.error(f"删除决策缓存出错: {e}")
+
+
+def _load_cached_decision(cache_file: str):
+    """读取缓存的决策，已过期或内容不再符合 schema 时删除该缓存"""
+    try:
+        if time.time() - os.stat(cache_file).st_mtime > _DECISION_CACHE_TTL:
+            _remove_cache_file(cache_file)
+            return None, None
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return content, _validate_decision(content)
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, ValidationError):
+        logger.warning(f"决策缓存不符合当前 schema，已删除: {cache_file}")
+        _remove_cache_file(cache_file)
+    except OSError as e:
+        logger.error(f"读取决策缓存出错: {e}")
+    return None, None
+
+
+def _prune_decision_cache():
+    """删除过期的决策缓存，文件数超过上限时再从最旧的开始删除"""
+    try:
+        with os.scandir(_DECISION_CACHE_DIR) as entries:
+            files = [(entry.stat().st_mtime, entry.path) for entry in entries
+                     if entry.name.endswith(".json") and entry.is_file()]
+    except OSError as e:
+        logger.error(f"清理决策缓存出错: {e}")
+        return
+    files.sort()
+    expired_before = time.time() - _DECISION_CACHE_TTL
+    excess = len(files) - _DECISION_CACHE_MAX_FILES
+    for i, (mtime, path) in enumerate(files):
+        if i >= excess and mtime >= expired_before:
+            break
+        _remove_cache_file(path)
+
+
+def _save_cached_decision(cache_file: str, content: str):
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+    except OSError as e:
+        logger.error(f"写入决策缓存出错: {e}")
+        return
+    _prune_decision_cache()
+
+
+def _cached_or_request_decision(cache_key: str, messages: list):
+    """依次查询进程内缓存、磁盘缓存，均未命中时请求 LLM 并回填两层缓存
+
+    Returns:
+        与 _request_decision 相同的 (原始响应文本, PortfolioDecision)
+    """
+    with _decision_memory_lock:
+        cached = _decision_memory_cache.get(cache_key)
+        if cached is not None:
+            _decision_memory_cache.move_to_end(cache_key)
+    if cached is not None:
+        logger.info("使用进程内缓存的投资组合决策")
+        return cached
+
+    cache_file = os.path.join(_DECISION_CACHE_DIR, f"{cache_key}.json")
+    content, decision = _load_cached_decision(cache_file)
+    if decision is not None:
+        logger.info("使用缓存的投资组合决策")
+    else:
+        content, decision = _request_decision(messages)
+        if decision is None:
+            return content, decision
+        _save_cached_decision(cache_file, content)
+
+    with _decision_memory_lock:
+        _decision_memory_cache[cache_key] = (content, decision)
+        if len(_decision_memory_cache) > _DECISION_MEMORY_CACHE_SIZE:
+            _decision_memory_cache.popitem(last=False)
+    return content, decision
+
+
+def _request_decision(messages: list):
+    """请求 LLM 给出结构化的交易决策，输出不符合 schema 时带上错误信息重试
+
+    Returns:
+        (原始响应文本, PortfolioDecision)；LLM 调用失败时原始响应为 None，
+        重试后仍无法通过校验时 PortfolioDecision 为 None
+    """
+    for attempt in range(_DECISION_MAX_RETRIES + 1):
+        content = get_chat_completion(messages, response_format=_DECISION_RESPONSE_FORMAT)
+        if content is None:
+            return None, None
+        try:
+            return content, _validate_decision(content)
+        except (json.JSONDecodeError, ValidationError) as e:
+            error = e
+        if attempt == _DECISION_MAX_RETRIES:
+            break
+        logger.warning(f"决策输出不符合 schema（第 {attempt + 1} 次），带上错误信息重试: {error}")
+        messages = messages + [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": f"Your previous output did not match the required JSON schema:\n{error}\nReturn the corrected JSON only."},
+        ]
+        time.sleep(1.0 * (attempt + 1))
+    return content, None
+
+
+def _basic_signal(data: dict, confidence: float, label: str) -> dict:
+    """构建 signal/confidence/details 三字段的团队信号条目（基本面、情绪、估值共用）"""
+    return {
+        "signal": data.get("signal", "error"),
+        "confidence": confidence,
+        "details": data.get("details", f"{label} message missing" if not data else "Available")
+    }
+
+
+def _forced_hold_decision(team_signals: dict, risk_data: dict):
+    """风险管理要求持有且仓位上限为 0 时，决策已由硬约束确定，直接在本地生成
+
+    Returns:
+        与 _request_decision 相同的 (原始响应文本, PortfolioDecision)；不满足条件时为 (None, None)
+    """
+    if risk_data.get("trading_action") != "hold":
+        return None, None
+    try:
+        if float(risk_data.get("max_position_size", 0)) > 0:
+            return None, None
+    except (TypeError, ValueError):
+        return None, None
+
+    agent_signals = [
+        AgentSignal(agent_name=name, signal=str(entry.get("signal", "neutral")),
+                    confidence=entry.get("confidence", 1.0 if name == "risk_management" else 0.0))
+        for name, entry in team_signals.items()
     ]
-    
-    for pattern in json_block_patterns:
-        match = re.search(pattern, cleaned_response, re.DOTALL)
-        if match:
-            try:
-                json_str = match.group(1).strip()
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                continue
-    
-    # 方法3: 尝试提取第一个 { ... } 之间的内容
-    json_start = cleaned_response.find('{')
-    if json_start >= 0:
-        json_end = cleaned_response.rfind('}')
-        if json_end > json_start:
-            json_str = cleaned_response[json_start:json_end + 1]
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                pass
-    
-    # 方法4: 尝试提取第一个 [ ... ] 之间的内容（如果是数组格式）
-    array_start = cleaned_response.find('[')
-    if array_start >= 0:
-        array_end = cleaned_response.rfind(']')
-        if array_end > array_start:
-            json_str = cleaned_response[array_start:array_end + 1]
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                pass
-    
-    # 如果所有方法都失败，抛出异常
-    raise json.JSONDecodeError(
-        f"无法解析 JSON。响应前200字符: {cleaned_response[:200]}",
-        cleaned_response,
-        0
+    agent_signals.append(AgentSignal(
+        agent_name="market_wide_news_summary(沪深300指数)", signal="neutral", confidence=0.0))
+    decision = PortfolioDecision(
+        action="hold",
+        quantity=0,
+        confidence=0.95,
+        agent_signals=agent_signals,
+        reasoning="Risk management hard constraint: trading_action is hold with a zero max position size, so the position is held unchanged regardless of other signals.",
+        reasoning_zh="风险管理硬约束：建议操作为持有且最大仓位为 0，因此无论其他信号如何均保持当前仓位不变。",
     )
+    return decision.model_dump_json(), decision
 
 
 @agent_endpoint("portfolio_management", "负责投资组合管理和最终交易决策")
 def portfolio_management_agent(state: AgentState):
     """Responsible for portfolio management"""
     agent_name = "portfolio_management_agent"
-    logger.info(f"\n--- DEBUG: {agent_name} START ---")
-    logger.info(f"🔍 DEBUG: 收到的消息列表: {[msg.name for msg in state['messages']]}")
-    logger.info(f"🔍 DEBUG: 消息数量: {len(state['messages'])}")
+    # 调试日志仅在 DEBUG 级别开启时才构建消息名称列表
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug("--- %s START --- 收到的消息列表: %s，消息数量: %d",
+                     agent_name, [msg.name for msg in state['messages']], len(state['messages']))
 
     # Log raw incoming messages
     # logger.info(
@@ -179,59 +483,45 @@ def portfolio_management_agent(state: AgentState):
     #     logger.info(
     #         f"  DEBUG RAW MSG {i}: name='{msg.name}', content_preview='{str(msg.content)[:100]}...'")
 
+    # 保护检查：确保关键消息存在
+    # 如果缺少 macro_analyst_agent 或 risk_management_agent，说明工作流执行顺序有问题
+    # 在这种情况下，提前返回，不执行主要逻辑，避免重复打印报告；
+    # 检查只需要消息名称集合，放在构建去重字典之前
+    message_names = {msg.name for msg in state["messages"]}
+    missing_agents = [agent for agent in _REQUIRED_AGENTS if agent not in message_names]
+    
+    if missing_agents:
+        logger.warning(f"⚠️ 缺少关键消息: {missing_agents}，portfolio_management_agent 可能被过早触发，跳过本次执行")
+        logger.warning(f"当前消息列表: {list(message_names)}")
+        # 不返回 data/metadata，避免 merge_dicts 无意义地复制整个字典
+        return {"messages": []}
+
     # Clean and unique messages by agent name, taking the latest if duplicates exist
     # This is crucial because this agent is a sink for multiple paths.
-    unique_incoming_messages = {}
+    msgs_by_name = {}
     for msg in state["messages"]:
         # Keep overriding with later messages to get the latest by name
-        unique_incoming_messages[msg.name] = msg
-
-    cleaned_messages_for_processing = list(unique_incoming_messages.values())
-    # logger.info(
-    # f"--- DEBUG: {agent_name} CLEANED messages for processing: {[msg.name for msg in cleaned_messages_for_processing]} ---")
+        msgs_by_name[msg.name] = msg
 
     show_workflow_status(f"{agent_name}: --- Executing Portfolio Manager ---")
     show_reasoning_flag = state["metadata"]["show_reasoning"]
     portfolio = state["data"]["portfolio"]
 
-    # 保护检查：确保关键消息存在
-    # 如果缺少 macro_analyst_agent 或 risk_management_agent，说明工作流执行顺序有问题
-    # 在这种情况下，提前返回，不执行主要逻辑，避免重复打印报告
-    required_agents = ["macro_analyst_agent", "risk_management_agent"]
-    missing_agents = [agent for agent in required_agents 
-                     if not any(msg.name == agent for msg in cleaned_messages_for_processing)]
-    
-    if missing_agents:
-        logger.warning(f"⚠️ 缺少关键消息: {missing_agents}，portfolio_management_agent 可能被过早触发，跳过本次执行")
-        logger.warning(f"当前消息列表: {[msg.name for msg in cleaned_messages_for_processing]}")
-        return {
-            "messages": [],
-            "data": state["data"],
-            "metadata": state["metadata"]
-        }
-
-    # Get messages from other agents using the cleaned list
-    technical_message = get_latest_message_by_name(
-        cleaned_messages_for_processing, "technical_analyst_agent")
-    fundamentals_message = get_latest_message_by_name(
-        cleaned_messages_for_processing, "fundamentals_agent")
-    sentiment_message = get_latest_message_by_name(
-        cleaned_messages_for_processing, "sentiment_agent")
+    # Get messages from other agents by name; missing ones fall back to the defaults below
+    technical_message = msgs_by_name.get("technical_analyst_agent")
+    fundamentals_message = msgs_by_name.get("fundamentals_agent")
+    sentiment_message = msgs_by_name.get("sentiment_agent")
     # 优先查找 valuation_agent_v2，如果不存在则回退到 valuation_agent
-    # 检查消息列表中是否存在对应的agent消息
-    valuation_message = None
-    for msg in cleaned_messages_for_processing:
-        if msg.name == "valuation_agent_v2":
-            valuation_message = msg
-            break
-    if not valuation_message:
-        # 如果没找到 valuation_agent_v2，尝试 valuation_agent
-        valuation_message = get_latest_message_by_name(
-            cleaned_messages_for_processing, "valuation_agent")
-    risk_message = get_latest_message_by_name(
-        cleaned_messages_for_processing, "risk_management_agent")
-    tool_based_macro_message = get_latest_message_by_name(
-        cleaned_messages_for_processing, "macro_analyst_agent")  # This is the main analysis path output
+    valuation_message = msgs_by_name.get("valuation_agent_v2") or msgs_by_name.get("valuation_agent")
+    risk_message = msgs_by_name["risk_management_agent"]
+    tool_based_macro_message = msgs_by_name["macro_analyst_agent"]  # This is the main analysis path output
+    for name, msg in (("technical_analyst_agent", technical_message),
+                      ("fundamentals_agent", fundamentals_message),
+                      ("sentiment_agent", sentiment_message),
+                      ("valuation_agent", valuation_message)):
+        if msg is None:
+            logger.warning(
+                f"Message from agent '{name}' not found in portfolio_management_agent.")
 
     # Extract and parse content from messages, handling format inconsistencies
     technical_data = parse_agent_message_content(
@@ -247,141 +537,88 @@ def portfolio_management_agent(state: AgentState):
     tool_based_macro_data = parse_agent_message_content(
         tool_based_macro_message.content if tool_based_macro_message else None, "macro_analyst_agent")
     
-    # 标准化 confidence 值并重新序列化为 JSON 字符串（用于 LLM prompt）
+    # 标准化 confidence 值，汇总为一个字典后一次性序列化为 JSON 字符串（用于 LLM prompt）
     # 同时保留原始数据用于后续处理
+    (technical_confidence, fundamentals_confidence,
+     sentiment_confidence, valuation_confidence) = normalize_confidences(
+        technical_data.get("confidence", 0.0),
+        fundamentals_data.get("confidence", 0.0),
+        sentiment_data.get("confidence", 0.0),
+        valuation_data.get("confidence", 0.0),
+    )
     # Technical agent 有复杂的结构，保留 strategy_signals
     technical_content_data = {
         "signal": technical_data.get("signal", "error"),
-        "confidence": normalize_confidence(technical_data.get("confidence", 0.0)),
+        "confidence": technical_confidence,
     }
     if "strategy_signals" in technical_data:
         technical_content_data["strategy_signals"] = technical_data["strategy_signals"]
     if "reasoning" in technical_data:
         technical_content_data["reasoning"] = technical_data["reasoning"]
-    technical_content = json.dumps(technical_content_data)
-    fundamentals_content = json.dumps({
-        "signal": fundamentals_data.get("signal", "error"),
-        "confidence": normalize_confidence(fundamentals_data.get("confidence", 0.0)),
-        "details": fundamentals_data.get("details", "Fundamentals message missing" if not fundamentals_data else "Available")
-    })
-    sentiment_content = json.dumps({
-        "signal": sentiment_data.get("signal", "error"),
-        "confidence": normalize_confidence(sentiment_data.get("confidence", 0.0)),
-        "details": sentiment_data.get("details", "Sentiment message missing" if not sentiment_data else "Available")
-    })
-    valuation_content = json.dumps({
-        "signal": valuation_data.get("signal", "error"),
-        "confidence": normalize_confidence(valuation_data.get("confidence", 0.0)),
-        "details": valuation_data.get("details", "Valuation message missing" if not valuation_data else "Available")
-    })
-    risk_content = json.dumps({
-        "signal": risk_data.get("trading_action", "error"),
-        "max_position_size_yuan": risk_data.get("max_position_size", 0),
-        "max_shares": risk_data.get("max_shares", 0),
-        "current_price": risk_data.get("current_price", 0),
-        "risk_score": risk_data.get("risk_score", 0),
-        "details": risk_data.get("details", "Risk message missing" if not risk_data else "Available")
-    })
-    tool_based_macro_content = json.dumps({
-        "signal": tool_based_macro_data.get("impact_on_stock", "error"),
-        "macro_environment": tool_based_macro_data.get("macro_environment", "neutral"),
-        "details": tool_based_macro_data.get("details", "Tool-based Macro message missing" if not tool_based_macro_data else "Available")
-    })
+    # 键名与 system prompt 中 agent_signals 要求的名称保持一致
+    team_signals = {
+        "technical_analysis": technical_content_data,
+        "fundamental_analysis": _basic_signal(fundamentals_data, fundamentals_confidence, "Fundamentals"),
+        "sentiment_analysis": _basic_signal(sentiment_data, sentiment_confidence, "Sentiment"),
+        "valuation_analysis": _basic_signal(valuation_data, valuation_confidence, "Valuation"),
+        "risk_management": {
+            "signal": risk_data.get("trading_action", "error"),
+            "max_position_size_yuan": risk_data.get("max_position_size", 0),
+            "max_shares": risk_data.get("max_shares", 0),
+            "current_price": risk_data.get("current_price", 0),
+            "risk_score": risk_data.get("risk_score", 0),
+            "details": risk_data.get("details", "Risk message missing" if not risk_data else "Available")
+        },
+        # General Macro Analysis (from Macro Analyst Agent)
+        "selected_stock_macro_analysis": {
+            "signal": tool_based_macro_data.get("impact_on_stock", "error"),
+            "macro_environment": tool_based_macro_data.get("macro_environment", "neutral"),
+            "details": tool_based_macro_data.get("details", "Tool-based Macro message missing" if not tool_based_macro_data else "Available")
+        },
+    }
+    # orjson 输出紧凑且不转义中文 details，减少发送给 LLM 的字节数
+    team_signals_payload = orjson.dumps(team_signals).decode()
 
     # Market-wide news summary from macro_news_agent (already correctly fetched from state["data"])
     market_wide_news_summary_content = state["data"].get(
         "macro_news_analysis_result", "大盘宏观新闻分析不可用或未提供。")
-    # Optional: also try to get the message object for consistency in agent_signals, though data field is primary source
-    macro_news_agent_message_obj = get_latest_message_by_name(
-        cleaned_messages_for_processing, "macro_news_agent")
-
-    system_message_content = """You are a portfolio manager making final trading decisions.
-            Your job is to make a trading decision based on the team's analysis while strictly adhering
-            to risk management constraints.
-
-            RISK MANAGEMENT CONSTRAINTS:
-            - You MUST NOT exceed the max_shares (in shares) specified by the risk manager
-            - max_position_size_yuan is the max position value in RMB; max_shares is already calculated as max_position_size_yuan / current_price, rounded down to nearest 100 (A-share lot size)
-            - You MUST follow the trading_action (buy/sell/hold) recommended by risk management
-            - These are hard constraints that cannot be overridden by other signals
 
-            When weighing the different signals for direction and timing (adjusted for A-share market characteristics):
-            1. Macro Analysis (25% weight) - This encompasses TWO inputs:
-               a) General Macro Environment (from Macro Analyst Agent, tool-based)
-               b) Daily Market-Wide News Summary (from Macro News Agent)
-               Both provide context for external risks and opportunities.
-               NOTE: A-share market is highly policy-driven, so macro analysis has the highest weight.
-            2. Technical Analysis (25% weight)
-               NOTE: A-share market is dominated by retail investors, making technical patterns more effective.
-            3. Fundamental Analysis (20% weight)
-               NOTE: Fundamentals provide important insights into company quality, profitability, growth, and financial health.
-            4. Valuation Analysis (15% weight)
-               NOTE: Valuation models have limitations in A-share market due to high volatility, policy influence, and model assumptions. Lower weight reflects these limitations.
-            5. Sentiment Analysis (15% weight)
-               NOTE: Market sentiment and fund flows significantly impact A-share market due to retail investor dominance.
-
-            The decision process should be (prioritized for A-share market):
-            1. First check risk management constraints
-            2. Evaluate BOTH the General Macro Environment AND the Daily Market-Wide News Summary (highest priority - policy-driven market)
-            3. Use technical analysis for entry/exit timing (high priority - retail investor behavior)
-            4. Evaluate fundamentals signal (company quality, profitability, growth, financial health)
-            5. Consider sentiment for market mood and fund flow assessment (moderate priority)
-            6. Finally evaluate valuation signal (reference only, as models have limitations)
-
-            Provide the following in your output JSON:
-            - "action": "buy" | "sell" | "hold",
-            - "quantity": <positive integer>
-            - "confidence": <float between 0 and 1>
-            - "agent_signals": <list of agent signals including agent name, signal (bullish | bearish | neutral), and their confidence>.
-              IMPORTANT: Your 'agent_signals' list MUST include entries for:
-                - "technical_analysis"
-                - "fundamental_analysis"
-                - "sentiment_analysis"
-                - "valuation_analysis"
-                - "risk_management"
-                - "selected_stock_macro_analysis" (representing the tool-based macro input from macro_analyst_agent)
-                - "market_wide_news_summary(沪深300指数)" (representing the daily news summary input from macro_news_agent - provide a brief signal like bullish/bearish/neutral for the news summary itself, or state if it was primarily factored into overall reasoning with confidence reflecting its impact)
-            - "reasoning": <concise explanation of the decision including how you weighted ALL signals, including both macro inputs (in English)>
-            - "reasoning_zh": <same explanation as 'reasoning' but translated into Chinese (中文)>
-
-            Trading Rules:
-            - Never exceed risk management position limits
-            - Only buy if you have available cash
-            - Only sell if you have shares to sell
-            - Quantity must be ≤ current position for sells
-            - Quantity (in shares) must be ≤ max_shares from risk management
-            - Quantity must be a multiple of 100 (A-share lot size)"""
-    system_message = {
-        "role": "system",
-        "content": system_message_content
-    }
-
-    user_message_content = f"""Based on the team's analysis below, make your trading decision.
-
-            Technical Analysis Signal: {technical_content}
-            Fundamental Analysis Signal: {fundamentals_content}
-            Sentiment Analysis Signal: {sentiment_content}
-            Valuation Analysis Signal: {valuation_content}
-            Risk Management Signal: {risk_content}
-            General Macro Analysis (from Macro Analyst Agent): {tool_based_macro_content}
-            Daily Market-Wide News Summary (from Macro News Agent):
-            {market_wide_news_summary_content}
-
-            Current Portfolio:
-            Cash: {portfolio['cash']:.2f}
-            Current Position: {portfolio['stock']} shares
-
-            Output JSON only. Ensure 'agent_signals' includes all required agents as per system prompt."""
+    user_message_content = _USER_PROMPT_TEMPLATE.format(
+        team_signals_payload=team_signals_payload,
+        market_wide_news_summary_content=market_wide_news_summary_content,
+        cash=portfolio['cash'],
+        stock=portfolio['stock'],
+    )
     user_message = {
         "role": "user",
         "content": user_message_content
     }
 
-    show_agent_reasoning(
-        agent_name, f"Preparing LLM. User msg includes: TA, FA, Sent, Val, Risk, GeneralMacro, MarketNews.")
-
-    llm_interaction_messages = [system_message, user_message]
-    llm_response_content = get_chat_completion(llm_interaction_messages)
+    if show_reasoning_flag:
+        show_agent_reasoning(
+            "Preparing LLM. User msg includes: TA, FA, Sent, Val, Risk, GeneralMacro, MarketNews.", agent_name)
+
+    llm_interaction_messages = [_SYSTEM_MESSAGE, user_message]
+
+    # 风险管理的硬约束已确定决策时，无需请求 LLM
+    llm_response_content, decision = _forced_hold_decision(team_signals, risk_data)
+    if decision is not None:
+        logger.info("风险管理要求持有且仓位上限为 0，跳过 LLM 调用")
+    elif state["metadata"].get("enable_llm_cache", True):
+        # 模型标识、prompt 版本与全部输入共同决定缓存键
+        cache_key = _decision_cache_key(
+            os.getenv("OPENAI_COMPATIBLE_BASE_URL", ""),
+            os.getenv("OPENAI_COMPATIBLE_MODEL", ""),
+            os.getenv("GEMINI_MODEL", ""),
+            _SYSTEM_PROMPT_SHA256,
+            team_signals_payload,
+            str(market_wide_news_summary_content),
+            f"{portfolio['cash']:.2f}|{portfolio['stock']}",
+        )
+        llm_response_content, decision = _cached_or_request_decision(
+            cache_key, llm_interaction_messages)
+    else:
+        llm_response_content, decision = _request_decision(llm_interaction_messages)
 
     current_metadata = state["metadata"]
     current_metadata["current_agent_name"] = agent_name
@@ -392,46 +629,26 @@ def portfolio_management_agent(state: AgentState):
 
     if llm_response_content is None:
         show_agent_reasoning(
-            agent_name, "LLM call failed. Using default conservative decision.")
+            "LLM call failed. Using default conservative decision.", agent_name)
         # Ensure the dummy response matches the expected structure for agent_signals
-        llm_response_content = json.dumps({
-            "action": "hold",
-            "quantity": 0,
-            "confidence": 0.7,
-            "agent_signals": [
-                {"agent_name": "technical_analysis",
-                    "signal": "neutral", "confidence": 0.0},
-                {"agent_name": "fundamental_analysis",
-                    "signal": "neutral", "confidence": 0.0},
-                {"agent_name": "sentiment_analysis",
-                    "signal": "neutral", "confidence": 0.0},
-                {"agent_name": "valuation_analysis",
-                    "signal": "neutral", "confidence": 0.0},
-                {"agent_name": "risk_management",
-                    "signal": "hold", "confidence": 1.0},
-                {"agent_name": "macro_analyst_agent",
-                    "signal": "neutral", "confidence": 0.0},
-                {"agent_name": "macro_news_agent",
-                    "signal": "unavailable_or_llm_error", "confidence": 0.0}
-            ],
-            "reasoning": "LLM API error. Defaulting to conservative hold based on risk management.",
-            "reasoning_zh": "LLM API 错误。基于风险管理，默认采取保守的持有策略。"
-        })
+        llm_response_content = _DEFAULT_LLM_FAILURE_JSON
 
     final_decision_message = HumanMessage(
         content=llm_response_content,
         name=agent_name,
     )
 
-    if show_reasoning_flag:
-        show_agent_reasoning(
-            agent_name, f"Final LLM decision JSON: {llm_response_content}")
-
     agent_decision_details_value = {}
+    decision_json = None
     formatted_report = None
     try:
-        # 使用改进的 JSON 解析函数
-        decision_json = parse_llm_json_response(llm_response_content)
+        # 已通过 schema 校验的决策直接使用，否则回退到宽松的 JSON 解析
+        decision_json = (decision.model_dump() if decision is not None
+                         else parse_llm_json_response(llm_response_content))
+        if not isinstance(decision_json, dict):
+            # 响应中只解析出数组等非对象 JSON 时，同样视为解析失败
+            raise json.JSONDecodeError(
+                "决策 JSON 不是对象", llm_response_content, 0)
         action = decision_json.get("action", "hold")
         quantity = decision_json.get("quantity", 0)
         confidence = decision_json.get("confidence", 0.0)
@@ -442,45 +659,44 @@ def portfolio_management_agent(state: AgentState):
             "action": action,
             "quantity": quantity,
             "confidence": confidence,
-            "reasoning_snippet": reasoning[:150] + "..." if reasoning else ""
+            "reasoning_snippet": _snip(reasoning, 150)
         }
             
     except json.JSONDecodeError as e:
+        decision_json = None
         agent_decision_details_value = {
             "error": "Failed to parse LLM decision JSON from portfolio manager",
-            "raw_response_snippet": llm_response_content[:500] + "..." if len(llm_response_content) > 500 else llm_response_content
+            "raw_response_snippet": _snip(llm_response_content)
         }
         logger.error(f"无法解析 LLM 返回的 JSON: {str(e)}")
-        logger.error(f"LLM 原始响应（前500字符）: {llm_response_content[:500]}")
+        logger.error(f"LLM 原始响应（前{_MAX_SNIPPET}字符）: {llm_response_content[:_MAX_SNIPPET]}")
         logger.exception("JSON 解析错误详情:")
 
-    show_workflow_status(f"{agent_name}: --- Portfolio Manager Completed ---")
-    logger.info(f"🏁 DEBUG: {agent_name} 执行完成，准备返回结果")
-    logger.info(f"🔍 DEBUG: 返回的消息数量: {len(cleaned_messages_for_processing) + 1}")
-
-    # The portfolio_management_agent is a terminal or near-terminal node in terms of new message generation for the main state.
-    # It should return its own decision, and an updated state["messages"] that includes its decision.
-    # As it's a汇聚点, it should ideally start with a cleaned list of messages from its inputs.
-    # The cleaned_messages_for_processing already did this. We append its new message to this cleaned list.
+    if show_reasoning_flag:
+        # 已解析的决策直接交给 show_agent_reasoning 格式化，避免再拼接/解析一遍原始响应
+        show_agent_reasoning(
+            decision_json if decision_json is not None else llm_response_content, agent_name)
 
-    # If we strictly want to follow the pattern of `state["messages"] + [new_message]` for all non-leaf nodes,
-    # then the `cleaned_messages_for_processing` should become the new `state["messages"]` for this node's context.
-    # However, for simplicity and robustness, let's assume its output `messages` should just be its own message added to the cleaned input it processed.
+    show_workflow_status(f"{agent_name}: --- Portfolio Manager Completed ---")
 
+    # messages 通道使用 operator.add 归约，只返回本节点新增的决策消息；
+    # data 中只写入已解析的决策，下游直接读取，无需再次解析消息内容
     final_messages_output = [final_decision_message]
 
-    logger.info(
-        f"🔍 DEBUG: {agent_name} RETURN messages: {[msg.name for msg in final_messages_output]}")
-    logger.info(f"✅ DEBUG: {agent_name} 返回状态字典，包含 {len(final_messages_output)} 条新消息")
+    if debug_enabled:
+        logger.debug("%s 执行完成，返回消息: %s",
+                     agent_name, [msg.name for msg in final_messages_output])
 
-    return {
+    result = {
         "messages": final_messages_output,
-        "data": state["data"],
         "metadata": {
             **state["metadata"],
             f"{agent_name}_decision_details": agent_decision_details_value,
             "agent_reasoning": llm_response_content
         }
     }
+    if decision_json is not None:
+        result["data"] = {"portfolio_decision": decision_json}
+    return result
 
 
@@ -1,5 +1,6 @@
 import math
 import logging
+from typing import Tuple
 
 from langchain_core.messages import HumanMessage
 
@@ -8,10 +9,139 @@ from src.tools.api import prices_to_df
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 
 import json
+import orjson
 import ast
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# 压力测试情景：(情景名称, 价格跌幅)
+STRESS_TEST_SCENARIOS = (
+    ("market_crash", -0.20),
+    ("moderate_decline", -0.10),
+    ("slight_decline", -0.05),
+)
+
+
+def _rolling_std(returns: np.ndarray, window: int) -> np.ndarray:
+    """滚动标准差（ddof=1），与 pandas rolling(window).std() 去掉前导 NaN 后的结果一致
+
+    用累计和与累计平方和一次性得到所有窗口的方差，总复杂度 O(N)；
+    先减去全局均值以减小累计和相减时的精度损失（方差对平移不变）。
+    """
+    if window < 2 or len(returns) < window:
+        return np.empty(0)
+    centered = returns - returns.mean()
+    csum = np.concatenate(([0.0], np.cumsum(centered)))
+    csum2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    sums = csum[window:] - csum[:-window]
+    sumsq = csum2[window:] - csum2[:-window]
+    var = (sumsq - sums * sums / window) / (window - 1)
+    return np.sqrt(np.maximum(var, 0.0))
+
+
+def _rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """滚动最大值，与 pandas rolling(window).max() 去掉前导 NaN 后的结果一致
+
+    van Herk/Gil-Werman 分块算法：按窗口长度分块，块内分别做正向、反向累计最大值，
+    每个窗口恰好覆盖某块的后缀和下一块的前缀，两者取较大值即可，总复杂度 O(N)。
+    窗口内含 NaN 时结果为 NaN。
+    """
+    n = len(values)
+    pad = -n % window
+    blocks = np.concatenate((values, np.full(pad, -np.inf))).reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.maximum(suffix[:n - window + 1], prefix[window - 1:n])
+
+
+def _quantile(values: np.ndarray, q: float) -> float:
+    """线性插值分位数，与 np.quantile / Series.quantile 的默认结果一致
+
+    只需要相邻的两个顺序统计量，用 np.partition 选出即可，无需完整排序。
+    """
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    part = np.partition(values, (lo, hi))
+    return float(part[lo] + (pos - lo) * (part[hi] - part[lo]))
+
+
+def _compute_risk_metrics(close: np.ndarray) -> Tuple[float, float, float, float]:
+    """在收盘价数组上计算各项市场风险指标
+
+    收益率只计算一次，波动率、波动率分布、VaR 和最大回撤都在同一个 float64 数组上完成，
+    不经过 pandas 对象。单项指标计算失败时记录警告并使用默认值，不影响其他指标。
+
+    Args:
+        close: 至少两个元素的收盘价数组
+
+    Returns:
+        (年化波动率, 95% VaR, 最大回撤, 波动率百分位数)，未做有限值检查
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(close) / close[:-1]
+    returns = returns[~np.isnan(returns)]
+    if len(returns) == 0:
+        volatility = 0.0
+        var_95 = 0.0
+        volatility_percentile = 0.0
+    else:
+        # Annualized volatility approximation
+        volatility = returns.std(ddof=1) * (252 ** 0.5) if len(returns) >= 2 else 0.0
+
+        # 计算波动率的历史分布
+        try:
+            rolling_std = _rolling_std(returns, min(120, len(returns))) * (252 ** 0.5)
+            # 滚动值不足两个时标准差无定义，按默认值处理；标准差为 NaN 时比较结果同样为 False
+            volatility_std = rolling_std.std(ddof=1) if len(rolling_std) >= 2 else 0.0
+            if volatility_std > 0:
+                volatility_percentile = (volatility - rolling_std.mean()) / volatility_std
+            else:
+                volatility_percentile = 0.0
+        except Exception as e:
+            logger.warning(f"⚠️ 计算波动率百分位数失败: {e}，使用默认值")
+            volatility_percentile = 0.0
+
+        # Simple historical VaR at 95% confidence
+        var_95 = _quantile(returns, 0.05)
+
+    # 使用60天窗口计算最大回撤
+    try:
+        # 数据不足60天时窗口取全部数据
+        window = min(60, len(close))
+        rolling_max = _rolling_max(close, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = close[window - 1:] / rolling_max - 1
+        drawdowns = drawdowns[~np.isnan(drawdowns)]
+        max_drawdown = float(drawdowns.min()) if len(drawdowns) else 0.0
+    except Exception as e:
+        logger.warning(f"⚠️ 计算最大回撤失败: {e}，使用默认值")
+        max_drawdown = 0.0
+
+    return volatility, var_95, max_drawdown, volatility_percentile
+
+
+def _parse_debate_content(content: str):
+    """解析辩论室消息内容
+
+    Python 字典字面量（以 "{'" 开头）直接交给 ast.literal_eval，不再先尝试一次必然失败的 JSON 解析；
+    其余内容优先使用 orjson，orjson 不接受 NaN/Infinity，失败时依次交给标准库和 ast 再解析。
+
+    Raises:
+        Exception: 所有解析方式都失败
+    """
+    if content.lstrip().startswith("{'"):
+        return ast.literal_eval(content)
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            return ast.literal_eval(content)
+
+
 ##### Risk Management Agent #####
 
 
@@ -24,6 +154,18 @@ def risk_management_agent(state: AgentState):
     data = state["data"]
 
     prices_df = prices_to_df(data["prices"])
+    # 价格数据行数只判断一次，数据为空或不足时后续各项计算直接走默认值
+    n_prices = len(prices_df) if prices_df is not None else 0
+
+    # 最新收盘价在仓位计算和可买股数中都会用到，只取一次
+    try:
+        if n_prices > 0:
+            last_close = float(prices_df['close'].iloc[-1])
+        else:
+            last_close = 0.0
+    except Exception as e:
+        logger.warning(f"⚠️ 获取最新收盘价失败: {e}，使用默认值")
+        last_close = 0.0
 
     # Fetch debate room message instead of individual analyst messages
     try:
@@ -36,18 +178,15 @@ def risk_management_agent(state: AgentState):
     # Parse debate results with fallback
     if debate_message:
         try:
-            debate_results = json.loads(debate_message.content)
+            debate_results = _parse_debate_content(debate_message.content)
         except Exception as e:
-            try:
-                debate_results = ast.literal_eval(debate_message.content)
-            except Exception as e2:
-                logger.warning(f"⚠️ 无法解析 debate_room_agent 消息: {e2}，使用默认值")
-                debate_results = {
-                    "bull_confidence": 0.0,
-                    "bear_confidence": 0.0,
-                    "confidence": 0.0,
-                    "signal": "neutral"
-                }
+            logger.warning(f"⚠️ 无法解析 debate_room_agent 消息: {e}，使用默认值")
+            debate_results = {
+                "bull_confidence": 0.0,
+                "bear_confidence": 0.0,
+                "confidence": 0.0,
+                "signal": "neutral"
+            }
     else:
         debate_results = {
             "bull_confidence": 0.0,
@@ -58,56 +197,16 @@ def risk_management_agent(state: AgentState):
 
     # 1. Calculate Risk Metrics with error handling
     try:
-        if prices_df is None or prices_df.empty or len(prices_df) < 2:
+        if n_prices < 2:
             logger.warning("⚠️ 价格数据为空或不足，使用默认风险指标")
             volatility = 0.0
             var_95 = 0.0
             max_drawdown = 0.0
             volatility_percentile = 0.0
         else:
-            returns = prices_df['close'].pct_change().dropna()
-            if len(returns) == 0:
-                volatility = 0.0
-                var_95 = 0.0
-                volatility_percentile = 0.0
-            else:
-                daily_vol = returns.std()
-                # Annualized volatility approximation
-                volatility = daily_vol * (252 ** 0.5) if not math.isnan(daily_vol) else 0.0
-
-                # 计算波动率的历史分布
-                try:
-                    rolling_std = returns.rolling(window=min(120, len(returns))).std() * (252 ** 0.5)
-                    volatility_mean = rolling_std.mean()
-                    volatility_std = rolling_std.std()
-                    if not math.isnan(volatility_mean) and not math.isnan(volatility_std) and volatility_std > 0:
-                        volatility_percentile = (volatility - volatility_mean) / volatility_std
-                    else:
-                        volatility_percentile = 0.0
-                except Exception as e:
-                    logger.warning(f"⚠️ 计算波动率百分位数失败: {e}，使用默认值")
-                    volatility_percentile = 0.0
-
-                # Simple historical VaR at 95% confidence
-                var_95 = returns.quantile(0.05) if len(returns) > 0 else 0.0
-                if math.isnan(var_95):
-                    var_95 = 0.0
-
-            # 使用60天窗口计算最大回撤
-            try:
-                if len(prices_df) >= 60:
-                    max_drawdown = (
-                        prices_df['close'] / prices_df['close'].rolling(window=60).max() - 1).min()
-                elif len(prices_df) >= 2:
-                    max_drawdown = (
-                        prices_df['close'] / prices_df['close'].rolling(window=len(prices_df)).max() - 1).min()
-                else:
-                    max_drawdown = 0.0
-                if math.isnan(max_drawdown):
-                    max_drawdown = 0.0
-            except Exception as e:
-                logger.warning(f"⚠️ 计算最大回撤失败: {e}，使用默认值")
-                max_drawdown = 0.0
+            # 先前向填充缺失值，与 pct_change 默认的填充方式一致
+            volatility, var_95, max_drawdown, volatility_percentile = _compute_risk_metrics(
+                prices_df['close'].ffill().to_numpy(dtype=np.float64))
     except Exception as e:
         logger.error(f"⚠️ 计算风险指标时发生错误: {e}，使用默认值")
         volatility = 0.0
@@ -115,6 +214,11 @@ def risk_management_agent(state: AgentState):
         max_drawdown = 0.0
         volatility_percentile = 0.0
 
+    # 各指标统一做一次有限值检查，NaN/inf（如收盘价为 0 时的收益率）按 0 处理
+    volatility, var_95, max_drawdown, volatility_percentile = (
+        float(x) if math.isfinite(x) else 0.0
+        for x in (volatility, var_95, max_drawdown, volatility_percentile))
+
     # 2. Market Risk Assessment
     market_risk_score = 0
 
@@ -139,15 +243,8 @@ def risk_management_agent(state: AgentState):
 
     # 3. Position Size Limits
     # Consider total portfolio value, not just cash
-    try:
-        if prices_df is not None and not prices_df.empty and len(prices_df) > 0:
-            current_stock_value = portfolio['stock'] * prices_df['close'].iloc[-1]
-        else:
-            current_stock_value = 0.0
-    except Exception as e:
-        logger.warning(f"⚠️ 计算当前股票价值失败: {e}，使用默认值")
-        current_stock_value = 0.0
-    
+    current_stock_value = portfolio['stock'] * last_close
+
     total_portfolio_value = portfolio['cash'] + current_stock_value
 
     # Start with 25% max position of total portfolio
@@ -164,22 +261,13 @@ def risk_management_agent(state: AgentState):
         max_position_size = base_position_size
 
     # 4. Stress Testing
-    stress_test_scenarios = {
-        "market_crash": -0.20,
-        "moderate_decline": -0.10,
-        "slight_decline": -0.05
-    }
-
+    # 组合总值与各情景无关，只计算一次
     stress_test_results = {}
-    current_position_value = current_stock_value
-
-    for scenario, decline in stress_test_scenarios.items():
-        potential_loss = current_position_value * decline
-        portfolio_impact = potential_loss / (portfolio['cash'] + current_position_value) if (
-            portfolio['cash'] + current_position_value) != 0 else math.nan
+    for scenario, decline in STRESS_TEST_SCENARIOS:
+        potential_loss = current_stock_value * decline
         stress_test_results[scenario] = {
             "potential_loss": potential_loss,
-            "portfolio_impact": portfolio_impact
+            "portfolio_impact": potential_loss / total_portfolio_value if total_portfolio_value != 0 else math.nan
         }
 
     # 5. Risk-Adjusted Signal Analysis
@@ -225,12 +313,7 @@ def risk_management_agent(state: AgentState):
             trading_action = "hold"
 
     # 计算最大可买股数（A股最小交易单位为100股/1手）
-    current_price = 0.0
-    try:
-        if prices_df is not None and not prices_df.empty:
-            current_price = float(prices_df['close'].iloc[-1])
-    except Exception:
-        pass
+    current_price = last_close
     if current_price > 0:
         max_shares = int(max_position_size / current_price / 100) * 100
     else:
@@ -262,7 +345,7 @@ def risk_management_agent(state: AgentState):
 
     # Create the risk management message
     message = HumanMessage(
-        content=json.dumps(message_content),
+        content=orjson.dumps(message_content).decode(),
         name="risk_management_agent",
     )
 
@@ -1,5 +1,6 @@
 from typing import Annotated, Any, Dict, Sequence, TypedDict
 
+import logging
 import operator
 from langchain_core.messages import BaseMessage
 import json
@@ -36,6 +37,10 @@ def show_workflow_status(agent_name: str, status: str = "processing"):
 
 def show_agent_reasoning(output, agent_name):
     """Display agent's analysis results."""
+    # 输出只写入 INFO 日志；INFO 未启用时没有任何接收方，跳过序列化和格式化
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
     def convert_to_serializable(obj):
         if hasattr(obj, 'to_dict'):  # Handle Pandas Series/DataFrame
             return obj.to_dict()
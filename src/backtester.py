@@ -113,7 +113,9 @@ class Backtester:
                     end_date=current_date,
                     portfolio=portfolio,
                     num_of_news=self.num_of_news,
-                    run_id=f"backtest_{self.ticker}_{current_date.replace('-', '')}"
+                    run_id=f"backtest_{self.ticker}_{current_date.replace('-', '')}",
+                    # 回测只使用返回的决策，不为每个交易日生成分析报告
+                    generate_report=False
                 )
 
                 try:
@@ -68,7 +68,7 @@ logger = setup_logger('main_workflow')
 # --- Run the Hedge Fund Workflow ---
 
 
-def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, portfolio: dict, show_reasoning: bool = False, num_of_news: int = 5, show_summary: bool = False):
+def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, portfolio: dict, show_reasoning: bool = False, num_of_news: int = 5, show_summary: bool = False, generate_report: bool = True):
     print(f"--- Starting Workflow Run ID: {run_id} ---")
     try:
         from backend.state import api_state
@@ -107,8 +107,8 @@ def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, por
             if HAS_STRUCTURED_OUTPUT and show_reasoning:
                 print_structured_output(final_state)
             
-            # 生成投资组合分析报告
-            if HAS_PORTFOLIO_REPORT:
+            # 生成投资组合分析报告（只需要决策结果的调用方可通过 generate_report=False 跳过）
+            if HAS_PORTFOLIO_REPORT and generate_report:
                 generate_portfolio_report(final_state, show_reasoning=show_reasoning)
     except ImportError:
         final_state = app.invoke(initial_state)
@@ -122,8 +122,8 @@ def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, por
         if HAS_STRUCTURED_OUTPUT and show_reasoning:
             print_structured_output(final_state)
         
-        # 生成投资组合分析报告
-        if HAS_PORTFOLIO_REPORT:
+        # 生成投资组合分析报告（只需要决策结果的调用方可通过 generate_report=False 跳过）
+        if HAS_PORTFOLIO_REPORT and generate_report:
             generate_portfolio_report(final_state, show_reasoning=show_reasoning)
         try:
             api_state.complete_run(run_id, "completed")
@@ -4,6 +4,7 @@ import akshare as ak
 import baostock as bs
 from datetime import datetime, timedelta
 import json
+import threading
 import numpy as np
 from src.utils.logging_config import setup_logger
 
@@ -13,6 +14,10 @@ logger = setup_logger('api')
 # Baostock 连接状态
 _bs_logged_in = False
 
+# Baostock 所有查询共用模块级的单个 socket 连接，并发请求会导致响应交错，
+# 因此 Baostock 查询需在该锁内串行执行（可重入，允许嵌套调用）
+_bs_lock = threading.RLock()
+
 def ensure_baostock_login():
     """确保 Baostock 已登录"""
     global _bs_logged_in
@@ -254,7 +259,8 @@ def get_financial_metrics(symbol: str) -> Dict[str, Any]:
         # 如果 akshare 失败，尝试使用 Baostock
         if stock_data is None or float(stock_data.get("总市值", 0)) == 0:
             logger.info("Attempting to fetch data from Baostock...")
-            baostock_data = get_market_data_from_baostock(symbol)
+            with _bs_lock:
+                baostock_data = get_market_data_from_baostock(symbol)
             
             if baostock_data:
                 # 使用 Baostock 数据填充 stock_data
@@ -899,21 +905,22 @@ def get_stock_industry(symbol: str) -> str:
         
         # 方法2: 尝试从Baostock获取行业信息
         try:
-            if ensure_baostock_login():
-                bs_code = convert_stock_code_to_baostock(symbol)
-                rs = bs.query_stock_industry(code=bs_code)
+            with _bs_lock:
+                if ensure_baostock_login():
+                    bs_code = convert_stock_code_to_baostock(symbol)
+                    rs = bs.query_stock_industry(code=bs_code)
                 
-                if rs.error_code == '0':
-                    industry_list = []
-                    while (rs.error_code == '0') & rs.next():
-                        industry_list.append(rs.get_row_data())
+                    if rs.error_code == '0':
+                        industry_list = []
+                        while (rs.error_code == '0') & rs.next():
+                            industry_list.append(rs.get_row_data())
                     
-                    if industry_list:
-                        industry_df = pd.DataFrame(industry_list, columns=rs.fields)
-                        if not industry_df.empty and 'industry' in industry_df.columns:
-                            industry = str(industry_df.iloc[0]['industry'])
-                            logger.info(f"✓ Industry info fetched from Baostock: {industry}")
-                            return industry
+                        if industry_list:
+                            industry_df = pd.DataFrame(industry_list, columns=rs.fields)
+                            if not industry_df.empty and 'industry' in industry_df.columns:
+                                industry = str(industry_df.iloc[0]['industry'])
+                                logger.info(f"✓ Industry info fetched from Baostock: {industry}")
+                                return industry
         except Exception as e:
             logger.debug(f"Failed to get industry from Baostock: {e}")
         
@@ -951,66 +958,67 @@ def get_market_data(symbol: str) -> Dict[str, Any]:
         # 如果 akshare 失败，尝试使用 Baostock
         if stock_data is None or float(stock_data.get("总市值", 0)) == 0:
             logger.info("Attempting to fetch market data from Baostock...")
-            baostock_data = get_market_data_from_baostock(symbol)
+            with _bs_lock:
+                baostock_data = get_market_data_from_baostock(symbol)
             
-            if baostock_data:
-                # 从 Baostock 获取历史数据来计算52周高低点
-                bs_code = convert_stock_code_to_baostock(symbol)
-                end_date = datetime.now().strftime("%Y-%m-%d")
-                start_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
+                if baostock_data:
+                    # 从 Baostock 获取历史数据来计算52周高低点
+                    bs_code = convert_stock_code_to_baostock(symbol)
+                    end_date = datetime.now().strftime("%Y-%m-%d")
+                    start_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
                 
-                rs = bs.query_history_k_data_plus(
-                    bs_code,
-                    "date,close,volume",
-                    start_date=start_date,
-                    end_date=end_date,
-                    frequency="d",
-                    adjustflag="3"
-                )
+                    rs = bs.query_history_k_data_plus(
+                        bs_code,
+                        "date,close,volume",
+                        start_date=start_date,
+                        end_date=end_date,
+                        frequency="d",
+                        adjustflag="3"
+                    )
                 
-                high_52w = 0
-                low_52w = 0
-                volume = 0
+                    high_52w = 0
+                    low_52w = 0
+                    volume = 0
                 
-                if rs.error_code == '0':
-                    data_list = []
-                    while (rs.error_code == '0') & rs.next():
-                        data_list.append(rs.get_row_data())
+                    if rs.error_code == '0':
+                        data_list = []
+                        while (rs.error_code == '0') & rs.next():
+                            data_list.append(rs.get_row_data())
                     
-                    if data_list:
-                        df = pd.DataFrame(data_list, columns=rs.fields)
-                        df['close'] = pd.to_numeric(df['close'], errors='coerce')
-                        df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
-                        high_52w = df['close'].max()
-                        low_52w = df['close'].min()
-                        volume = df['volume'].iloc[-1] if len(df) > 0 else 0
+                        if data_list:
+                            df = pd.DataFrame(data_list, columns=rs.fields)
+                            df['close'] = pd.to_numeric(df['close'], errors='coerce')
+                            df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
+                            high_52w = df['close'].max()
+                            low_52w = df['close'].min()
+                            volume = df['volume'].iloc[-1] if len(df) > 0 else 0
                 
-                logger.info("✓ Using Baostock market data as fallback")
+                    logger.info("✓ Using Baostock market data as fallback")
                 
-                # 尝试从 Baostock 获取股票名称
-                stock_name = ""
-                try:
-                    rs_basic = bs.query_stock_basic(code=bs_code)
-                    if rs_basic.error_code == '0':
-                        basic_list = []
-                        while (rs_basic.error_code == '0') & rs_basic.next():
-                            basic_list.append(rs_basic.get_row_data())
-                        if basic_list:
-                            basic_df = pd.DataFrame(basic_list, columns=rs_basic.fields)
-                            if not basic_df.empty and 'code_name' in basic_df.columns:
-                                stock_name = basic_df.iloc[0].get('code_name', '')
-                except Exception as e:
-                    logger.warning(f"Failed to fetch stock name from Baostock: {e}")
+                    # 尝试从 Baostock 获取股票名称
+                    stock_name = ""
+                    try:
+                        rs_basic = bs.query_stock_basic(code=bs_code)
+                        if rs_basic.error_code == '0':
+                            basic_list = []
+                            while (rs_basic.error_code == '0') & rs_basic.next():
+                                basic_list.append(rs_basic.get_row_data())
+                            if basic_list:
+                                basic_df = pd.DataFrame(basic_list, columns=rs_basic.fields)
+                                if not basic_df.empty and 'code_name' in basic_df.columns:
+                                    stock_name = basic_df.iloc[0].get('code_name', '')
+                    except Exception as e:
+                        logger.warning(f"Failed to fetch stock name from Baostock: {e}")
                 
-                return {
-                    "stock_name": stock_name,
-                    "industry": industry,
-                    "market_cap": baostock_data.get("market_cap", 0),
-                    "volume": volume,
-                    "average_volume": volume,  # 使用当前成交量作为平均值
-                    "fifty_two_week_high": high_52w,
-                    "fifty_two_week_low": low_52w
-                }
+                    return {
+                        "stock_name": stock_name,
+                        "industry": industry,
+                        "market_cap": baostock_data.get("market_cap", 0),
+                        "volume": volume,
+                        "average_volume": volume,  # 使用当前成交量作为平均值
+                        "fifty_two_week_high": high_52w,
+                        "fifty_two_week_low": low_52w
+                    }
         
         # 如果有 akshare 数据，使用它
         if stock_data is not None:
@@ -1300,22 +1308,22 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         logger.error(f"Error getting price history: {e}")
         logger.info("尝试使用 Baostock 获取价格历史...")
         try:
-            import baostock as bs
-            bs.login()
-            prefix = "sh" if symbol.startswith("6") else "sz"
-            bs_code = f"{prefix}.{symbol}"
-            rs = bs.query_history_k_data_plus(
-                bs_code,
-                "date,open,high,low,close,volume,amount",
-                start_date=start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime) else start_date,
-                end_date=end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime) else end_date,
-                frequency="d",
-                adjustflag="2",  # 前复权
-            )
-            rows = []
-            while rs.error_code == '0' and rs.next():
-                rows.append(rs.get_row_data())
-            bs.logout()
+            with _bs_lock:
+                # 复用共享登录会话，避免登出时中断其他线程正在使用的连接
+                ensure_baostock_login()
+                prefix = "sh" if symbol.startswith("6") else "sz"
+                bs_code = f"{prefix}.{symbol}"
+                rs = bs.query_history_k_data_plus(
+                    bs_code,
+                    "date,open,high,low,close,volume,amount",
+                    start_date=start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime) else start_date,
+                    end_date=end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime) else end_date,
+                    frequency="d",
+                    adjustflag="2",  # 前复权
+                )
+                rows = []
+                while rs.error_code == '0' and rs.next():
+                    rows.append(rs.get_row_data())
 
             if rows:
                 df = pd.DataFrame(rows, columns=rs.fields)
@@ -1360,8 +1368,28 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         return pd.DataFrame()
 
 
+# 最近一次转换的 (价格数据对象, DataFrame)；同一次分析中技术分析师和风险管理
+# 共用 state["data"]["prices"] 这同一个对象，第二次转换直接复制缓存结果。
+# 持有原对象的引用，保证按 is 比较时不会因 id 复用而误命中
+_prices_df_cache = (None, None)
+
+
 def prices_to_df(prices):
-    """Convert price data to DataFrame with standardized column names"""
+    """Convert price data to DataFrame with standardized column names
+
+    对同一个价格数据对象只构建一次 DataFrame，之后返回缓存的副本，调用方可自由修改
+    """
+    global _prices_df_cache
+    cached_prices, cached_df = _prices_df_cache
+    if prices is not None and cached_prices is prices:
+        return cached_df.copy()
+    df = _build_prices_df(prices)
+    _prices_df_cache = (prices, df)
+    return df.copy()
+
+
+def _build_prices_df(prices):
+    """将价格数据转换为带标准列名的 DataFrame"""
     try:
         df = pd.DataFrame(prices)
 
@@ -9,35 +9,12 @@ import pandas as pd
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple
 from src.utils.logging_config import setup_logger
+# Baostock 所有查询共用模块级的单个 socket 连接：登录状态和串行化查询的锁
+# 复用 src.tools.api 中的同一份，与价格等其他 Baostock 查询之间也不会交错
+from src.tools.api import _bs_lock, baostock_logout, ensure_baostock_login
 
 logger = setup_logger('baostock_financial')
 
-# Baostock 连接状态
-_bs_logged_in = False
-
-
-def ensure_baostock_login():
-    """确保 Baostock 已登录"""
-    global _bs_logged_in
-    if not _bs_logged_in:
-        logger.info("Logging in to Baostock...")
-        lg = bs.login()
-        if lg.error_code != '0':
-            logger.error(f"Baostock login failed: {lg.error_msg}")
-            return False
-        _bs_logged_in = True
-        logger.info("✓ Baostock login successful")
-    return True
-
-
-def baostock_logout():
-    """登出 Baostock"""
-    global _bs_logged_in
-    if _bs_logged_in:
-        bs.logout()
-        _bs_logged_in = False
-        logger.info("✓ Baostock logged out")
-
 
 def convert_stock_code_to_baostock(symbol: str) -> str:
     """将股票代码转换为 Baostock 格式"""
@@ -86,6 +63,53 @@ def safe_float(value: Any, default: float = 0.0) -> float:
         return default
 
 
+def _iter_rows(rs):
+    """逐行产出 Baostock 结果集中的数据，遇到错误时停止"""
+    next_row = rs.next
+    get_row = rs.get_row_data
+    while rs.error_code == '0' and next_row():
+        yield get_row()
+
+
+def _fetch_statement(query, label: str, bs_code: str, year: int, quarter: int, period_label: str) -> pd.DataFrame:
+    """
+    查询单期财务报表并转换为 DataFrame
+
+    Args:
+        query: Baostock 查询函数，如 bs.query_profit_data
+        label: 日志中使用的报表名称
+        bs_code: Baostock 格式的股票代码
+        year: 年份
+        quarter: 季度
+        period_label: 报告期标签，如 2024Q3
+
+    Returns:
+        pd.DataFrame: 报表数据，获取失败或无数据时返回空 DataFrame
+    """
+    try:
+        with _bs_lock:
+            rs = query(code=bs_code, year=year, quarter=quarter)
+            if rs.error_code != '0':
+                logger.warning(f"Failed to fetch {label} data for {period_label}: {rs.error_msg}")
+                return pd.DataFrame()
+            df = pd.DataFrame.from_records(_iter_rows(rs), columns=rs.fields)
+        if not df.empty:
+            logger.info(f"✓ {label.capitalize()} data fetched for {period_label}")
+            return df
+        logger.warning(f"No {label} data for {period_label}")
+    except Exception as e:
+        logger.error(f"Error fetching {label} data for {period_label}: {e}")
+    return pd.DataFrame()
+
+
+# (all_data 键名, 查询函数, 日志名称)：利润表、资产负债表、现金流量表
+_STATEMENT_QUERIES = (
+    ('profit', bs.query_profit_data, 'profit'),
+    ('balance', bs.query_balance_data, 'balance'),
+    ('cash_flow', bs.query_cash_flow_data, 'cash flow'),
+)
+
+
 def get_comprehensive_financial_data(symbol: str, num_periods: int = 8) -> Dict[str, Any]:
     """
     获取全面的财务数据，包括利润表、资产负债表和现金流量表
@@ -128,68 +152,8 @@ def get_comprehensive_financial_data(symbol: str, num_periods: int = 8) -> Dict[
         period_label = f"{current_year}Q{current_quarter}"
         all_data['periods'].append(period_label)
         
-        # 获取利润表数据
-        try:
-            rs_profit = bs.query_profit_data(code=bs_code, year=current_year, quarter=current_quarter)
-            if rs_profit.error_code == '0':
-                profit_list = []
-                while (rs_profit.error_code == '0') & rs_profit.next():
-                    profit_list.append(rs_profit.get_row_data())
-                if profit_list:
-                    profit_df = pd.DataFrame(profit_list, columns=rs_profit.fields)
-                    all_data['profit'].append(profit_df)
-                    logger.info(f"✓ Profit data fetched for {period_label}")
-                else:
-                    all_data['profit'].append(pd.DataFrame())
-                    logger.warning(f"No profit data for {period_label}")
-            else:
-                all_data['profit'].append(pd.DataFrame())
-                logger.warning(f"Failed to fetch profit data for {period_label}: {rs_profit.error_msg}")
-        except Exception as e:
-            logger.error(f"Error fetching profit data for {period_label}: {e}")
-            all_data['profit'].append(pd.DataFrame())
-        
-        # 获取资产负债表数据
-        try:
-            rs_balance = bs.query_balance_data(code=bs_code, year=current_year, quarter=current_quarter)
-            if rs_balance.error_code == '0':
-                balance_list = []
-                while (rs_balance.error_code == '0') & rs_balance.next():
-                    balance_list.append(rs_balance.get_row_data())
-                if balance_list:
-                    balance_df = pd.DataFrame(balance_list, columns=rs_balance.fields)
-                    all_data['balance'].append(balance_df)
-                    logger.info(f"✓ Balance data fetched for {period_label}")
-                else:
-                    all_data['balance'].append(pd.DataFrame())
-                    logger.warning(f"No balance data for {period_label}")
-            else:
-                all_data['balance'].append(pd.DataFrame())
-                logger.warning(f"Failed to fetch balance data for {period_label}: {rs_balance.error_msg}")
-        except Exception as e:
-            logger.error(f"Error fetching balance data for {period_label}: {e}")
-            all_data['balance'].append(pd.DataFrame())
-        
-        # 获取现金流量表数据
-        try:
-            rs_cash = bs.query_cash_flow_data(code=bs_code, year=current_year, quarter=current_quarter)
-            if rs_cash.error_code == '0':
-                cash_list = []
-                while (rs_cash.error_code == '0') & rs_cash.next():
-                    cash_list.append(rs_cash.get_row_data())
-                if cash_list:
-                    cash_df = pd.DataFrame(cash_list, columns=rs_cash.fields)
-                    all_data['cash_flow'].append(cash_df)
-                    logger.info(f"✓ Cash flow data fetched for {period_label}")
-                else:
-                    all_data['cash_flow'].append(pd.DataFrame())
-                    logger.warning(f"No cash flow data for {period_label}")
-            else:
-                all_data['cash_flow'].append(pd.DataFrame())
-                logger.warning(f"Failed to fetch cash flow data for {period_label}: {rs_cash.error_msg}")
-        except Exception as e:
-            logger.error(f"Error fetching cash flow data for {period_label}: {e}")
-            all_data['cash_flow'].append(pd.DataFrame())
+        for key, query, label in _STATEMENT_QUERIES:
+            all_data[key].append(_fetch_statement(query, label, bs_code, current_year, current_quarter, period_label))
     
     return all_data
 
@@ -12,6 +12,14 @@ from typing import List, Dict, Optional
 from bs4 import BeautifulSoup
 import time
 
+# 每条新闻都会用到的预编译正则
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_NUMBER_RE = re.compile(r'(\d+)')
+_CLOCK_TIME_RE = re.compile(r'(\d{1,2}:\d{2})')
+_MONTH_DAY_TIME_RE = re.compile(r'\d{2}-\d{2}\s+\d{2}:\d{2}')
+_FULL_DATETIME_RE = re.compile(r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}')
+
+
 def get_eastmoney_stock_news(stock_code: str, max_news: int = 20) -> List[Dict]:
     """
     从东方财富网获取个股新闻
@@ -360,7 +368,7 @@ def get_eastmoney_industry_news(industry: str, max_news: int = 20) -> List[Dict]
                 for article in articles[:max_news]:
                     title = article.get('title', '').replace('<em>', '').replace('</em>', '')
                     content = article.get('content', '') or article.get('mediaName', '') or title
-                    content = re.sub(r'<[^>]+>', '', content).strip()
+                    content = _HTML_TAG_RE.sub('', content).strip()
                     
                     if not title or len(title) < 6:
                         continue
@@ -483,29 +491,29 @@ def normalize_time(time_str: str) -> str:
         
         # 处理相对时间
         if '分钟前' in time_str:
-            minutes = int(re.search(r'(\d+)', time_str).group(1))
+            minutes = int(_NUMBER_RE.search(time_str).group(1))
             return (now - timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
         
         if '小时前' in time_str:
-            hours = int(re.search(r'(\d+)', time_str).group(1))
+            hours = int(_NUMBER_RE.search(time_str).group(1))
             return (now - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
         
         if '天前' in time_str:
-            days = int(re.search(r'(\d+)', time_str).group(1))
+            days = int(_NUMBER_RE.search(time_str).group(1))
             return (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
         
         # 处理 "今天 HH:MM" 格式
         if '今天' in time_str:
-            time_part = re.search(r'(\d{1,2}:\d{2})', time_str)
+            time_part = _CLOCK_TIME_RE.search(time_str)
             if time_part:
                 return f"{now.strftime('%Y-%m-%d')} {time_part.group(1)}:00"
         
         # 处理 "MM-DD HH:MM" 格式
-        if re.match(r'\d{2}-\d{2}\s+\d{2}:\d{2}', time_str):
+        if _MONTH_DAY_TIME_RE.match(time_str):
             return f"{now.year}-{time_str}:00"
         
         # 处理 "YYYY-MM-DD HH:MM:SS" 格式（已标准化）
-        if re.match(r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}', time_str):
+        if _FULL_DATETIME_RE.match(time_str):
             return time_str
         
         # 其他格式，返回当前时间
@@ -11,6 +11,11 @@ from datetime import datetime, timedelta
 from typing import List, Dict
 from bs4 import BeautifulSoup
 
+# 时间格式化用的预编译正则，每条新闻都会调用
+_MONTH_DAY_TIME_RE = re.compile(r'(\d+)月(\d+)日\s+(\d+):(\d+)')
+_FULL_DATETIME_RE = re.compile(r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}')
+_NUMBER_RE = re.compile(r'(\d+)')
+
 
 def get_sina_stock_news(stock_code: str, max_news: int = 20) -> List[Dict]:
     """
@@ -252,22 +257,22 @@ def normalize_sina_time(time_str: str) -> str:
         now = datetime.now()
         
         # 处理 "MM月DD日 HH:MM" 格式
-        match = re.search(r'(\d+)月(\d+)日\s+(\d+):(\d+)', time_str)
+        match = _MONTH_DAY_TIME_RE.search(time_str)
         if match:
             month, day, hour, minute = match.groups()
             return f"{now.year}-{int(month):02d}-{int(day):02d} {hour}:{minute}:00"
         
         # 处理 "YYYY-MM-DD HH:MM:SS" 格式
-        if re.match(r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}', time_str):
+        if _FULL_DATETIME_RE.match(time_str):
             return time_str
         
         # 处理相对时间
         if '分钟前' in time_str:
-            minutes = int(re.search(r'(\d+)', time_str).group(1))
+            minutes = int(_NUMBER_RE.search(time_str).group(1))
             return (now - timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
         
         if '小时前' in time_str:
-            hours = int(re.search(r'(\d+)', time_str).group(1))
+            hours = int(_NUMBER_RE.search(time_str).group(1))
             return (now - timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
         
         # 默认返回当前时间
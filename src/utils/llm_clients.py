@@ -3,7 +3,7 @@ import time
 import backoff
 from abc import ABC, abstractmethod
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, BadRequestError
 from google import genai
 from src.utils.logging_config import setup_logger, SUCCESS_ICON, ERROR_ICON, WAIT_ICON
 
@@ -73,8 +73,12 @@ class GeminiClient(LLMClient):
                 logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
             raise e
 
-    def get_completion(self, messages, max_retries=3, initial_retry_delay=1, **kwargs):
-        """获取聊天完成结果，包含重试逻辑"""
+    def get_completion(self, messages, max_retries=3, initial_retry_delay=1,
+                       response_format=None, **kwargs):
+        """获取聊天完成结果，包含重试逻辑
+
+        response_format 不为空时要求模型直接输出 JSON
+        """
         try:
             logger.info(f"{WAIT_ICON} 使用 Gemini 模型: {self.model}")
             logger.debug(f"消息内容: {messages}")
@@ -99,6 +103,8 @@ class GeminiClient(LLMClient):
                     config = {}
                     if system_instruction:
                         config['system_instruction'] = system_instruction
+                    if response_format:
+                        config['response_mime_type'] = 'application/json'
 
                     # 调用 API
                     response = self.generate_content_with_retry(
@@ -142,6 +148,10 @@ class GeminiClient(LLMClient):
 class OpenAICompatibleClient(LLMClient):
     """OpenAI 兼容 API 客户端"""
 
+    # 拒绝过 response_format 的 (base_url, model)：客户端每次调用都会重新创建，
+    # 因此记录在类上、进程内共享，之后对同一模型不再发送该参数
+    _response_format_unsupported = set()
+
     def __init__(self, api_key=None, base_url=None, model=None):
         self.api_key = api_key or os.getenv("OPENAI_COMPATIBLE_API_KEY")
         self.base_url = base_url or os.getenv("OPENAI_COMPATIBLE_BASE_URL")
@@ -169,23 +179,43 @@ class OpenAICompatibleClient(LLMClient):
         )
         logger.info(f"{SUCCESS_ICON} OpenAI Compatible 客户端初始化成功")
 
+    def _with_prompt_cache_hints(self, messages):
+        """为需要显式声明的服务商标记可缓存的 system prompt
+
+        OpenAI 等服务商会自动缓存相同前缀，无需处理；经 OpenRouter 调用
+        Anthropic 模型时需要在 system 消息上声明 cache_control 才会启用缓存。
+        """
+        if "openrouter" not in self.base_url or not self.model.startswith("anthropic/"):
+            return messages
+        return [
+            {**message, "content": [{"type": "text", "text": message["content"],
+                                     "cache_control": {"type": "ephemeral"}}]}
+            if message["role"] == "system" and isinstance(message["content"], str)
+            else message
+            for message in messages
+        ]
+
     @backoff.on_exception(
         backoff.expo,
         (Exception),
         max_tries=5,
-        max_time=300
+        max_time=300,
+        # 400 错误（如服务商不支持 response_format）重试无意义
+        giveup=lambda e: isinstance(e, BadRequestError)
     )
-    def call_api_with_retry(self, messages, stream=False):
+    def call_api_with_retry(self, messages, stream=False, response_format=None):
         """带重试机制的 API 调用函数"""
         try:
             logger.info(f"{WAIT_ICON} 正在调用 OpenAI Compatible API...")
             logger.debug(f"请求内容: {messages}")
             logger.debug(f"模型: {self.model}, 流式: {stream}")
 
+            extra_params = {"response_format": response_format} if response_format else {}
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                stream=stream
+                stream=stream,
+                **extra_params
             )
 
             logger.info(f"{SUCCESS_ICON} API 调用成功")
@@ -195,16 +225,35 @@ class OpenAICompatibleClient(LLMClient):
             logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
             raise e
 
-    def get_completion(self, messages, max_retries=3, initial_retry_delay=1, **kwargs):
-        """获取聊天完成结果，包含重试逻辑"""
+    def get_completion(self, messages, max_retries=3, initial_retry_delay=1,
+                       response_format=None, **kwargs):
+        """获取聊天完成结果，包含重试逻辑
+
+        response_format 为 OpenAI 格式的结构化输出声明；服务商不支持时自动去掉后重试
+        """
         try:
             logger.info(f"{WAIT_ICON} 使用 OpenAI Compatible 模型: {self.model}")
             logger.debug(f"消息内容: {messages}")
 
+            messages = self._with_prompt_cache_hints(messages)
+            format_key = (self.base_url, self.model)
+            if format_key in self._response_format_unsupported:
+                response_format = None
             for attempt in range(max_retries):
                 try:
                     # 调用 API
-                    response = self.call_api_with_retry(messages)
+                    try:
+                        response = self.call_api_with_retry(
+                            messages, response_format=response_format)
+                    except BadRequestError as e:
+                        if not response_format:
+                            raise
+                        if format_key not in self._response_format_unsupported:
+                            self._response_format_unsupported.add(format_key)
+                            logger.warning(
+                                f"{ERROR_ICON} 模型不支持 response_format，此后改用普通输出: {str(e)}")
+                        response_format = None
+                        response = self.call_api_with_retry(messages)
 
                     if response is None:
                         logger.warning(
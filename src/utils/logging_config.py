@@ -14,18 +14,19 @@ def setup_logger(name: str, log_dir: Optional[str] = None) -> logging.Logger:
     Returns:
         配置好的logger实例
     """
-    # 设置 root logger 的级别为 DEBUG
-    logging.getLogger().setLevel(logging.DEBUG)
-
     # 获取或创建 logger
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)  # logger本身记录DEBUG级别及以上
-    logger.propagate = False  # 防止日志消息传播到父级logger
 
-    # 如果已经有处理器，不再添加
+    # 如果已经配置过（已有处理器），直接复用，不再重复设置级别或添加处理器
     if logger.handlers:
         return logger
 
+    # 设置 root logger 的级别为 DEBUG
+    logging.getLogger().setLevel(logging.DEBUG)
+
+    logger.setLevel(logging.DEBUG)  # logger本身记录DEBUG级别及以上
+    logger.propagate = False  # 防止日志消息传播到父级logger
+
     # 创建控制台处理器
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)  # 控制台只显示INFO及以上级别
@@ -3,16 +3,102 @@
 负责生成和保存投资分析报告，包括控制台输出和 Markdown 文件生成。
 """
 
+import atexit
 import json
+import logging
+import orjson
 import re
-import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 from src.utils.logging_config import setup_logger
 from src.agents.state import show_agent_reasoning
 
 logger = setup_logger('portfolio_report')
 
+# 预编译的正则，避免每次调用时重新解析；JSON 片段扫描只关心的记号：转义序列、引号和括号
+_JSON_STRUCTURE_RE = re.compile(r'\\.|["{}\[\]]', re.DOTALL)
+
+# 信号的中文显示名称，其余信号均显示为“中性”
+_SIGNAL_ZH = {"bullish": "看多", "bearish": "看空"}
+
+# 控制台报告的分隔线与标题横幅
+_REPORT_RULE = "=" * 36
+_REPORT_BANNER = f"{_REPORT_RULE}\n          投资分析报告\n{_REPORT_RULE}"
+
+# 报告文件写入线程池，首次写报告时才创建；进程退出前等待未完成的写入
+_report_executor: Optional[ThreadPoolExecutor] = None
+_report_executor_lock = threading.Lock()
+
+# 报告中使用其原始数据的 agent 及对应的数据键
+_RAW_DATA_KEYS = {
+    "technical_analyst_agent": "technical",
+    "fundamentals_agent": "fundamentals",
+    "sentiment_agent": "sentiment",
+    "valuation_agent": "valuation",
+    "valuation_agent_v2": "valuation",  # 支持V2版本的估值代理
+    "risk_management_agent": "risk",
+    "macro_analyst_agent": "macro_analyst",
+}
+
+# Agent 名称映射（中文显示名称），用于详细推理信息部分
+_AGENT_DISPLAY_NAMES = {
+    "technical_analyst_agent": "技术分析师",
+    "fundamentals_agent": "基本面分析师",
+    "sentiment_agent": "情绪分析师",
+    "valuation_agent": "估值分析师",
+    "valuation_agent_v2": "估值分析师（V2）",  # 支持V2版本的估值代理
+    "risk_management_agent": "风险管理专家",
+    "macro_analyst_agent": "宏观分析师",
+    "macro_news_agent": "宏观新闻分析师",
+    "researcher_bull_agent": "看多研究员",
+    "researcher_bear_agent": "看空研究员",
+    "debate_room_agent": "辩论室"
+}
+
+
+def _iter_json_spans(text: str, opener: str = '{'):
+    """依次产出以 opener 开始、括号配平的候选 JSON 片段
+    
+    跟踪 {} 与 [] 的嵌套深度，字符串字面量（含转义字符）中的括号不计入。
+    由预编译正则在 C 层跳过普通字符，Python 循环只处理括号、引号和转义序列。
+    说明文字中也可能出现括号（如 "{technical, valuation}"），调用方解析某个片段失败后
+    继续迭代，从该片段之后的下一个 opener 重新扫描；无法配平的 opener 则从其后一位继续。
+    
+    Args:
+        text: 待扫描的文本
+        opener: 起始字符，'{' 或 '['
+        
+    Yields:
+        配平的候选 JSON 片段
+    """
+    start = text.find(opener)
+    while start >= 0:
+        end = None
+        depth = 0
+        in_string = False
+        for match in _JSON_STRUCTURE_RE.finditer(text, start):
+            token = match.group()
+            if token[0] == '\\':
+                # 转义序列整体跳过（含 \" 和 \\）
+                continue
+            if token == '"':
+                in_string = not in_string
+            elif in_string:
+                continue
+            elif token == '{' or token == '[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    end = match.end()
+                    break
+        if end is None:
+            start = text.find(opener, start + 1)
+        else:
+            yield text[start:end]
+            start = text.find(opener, end)
+
 
 def parse_llm_json_response(response: str) -> dict:
     """解析 LLM 返回的 JSON 响应，处理 markdown 代码块和额外文本
@@ -32,50 +118,25 @@ def parse_llm_json_response(response: str) -> dict:
     # 清理响应
     cleaned_response = response.strip()
     
-    # 方法1: 尝试直接解析
-    try:
-        return json.loads(cleaned_response)
-    except json.JSONDecodeError:
-        pass
-    
-    # 方法2: 尝试提取 markdown 代码块中的 JSON
-    # 匹配 ```json ... ``` 或 ``` ... ```
-    json_block_patterns = [
-        r'```json\s*(.*?)\s*```',  # ```json ... ```
-        r'```\s*(.*?)\s*```',       # ``` ... ```
-    ]
+    # 按首字符分派：只有以 { 或 [ 开头时才值得直接解析，
+    # 以 ``` 代码块或说明文字开头的响应直接进入扫描，省去一次必然失败的 json.loads
+    first = cleaned_response[:1]
+    if first == '{' or first == '[':
+        # 方法1: 直接解析（失败说明尾部带有额外文本，继续交给扫描处理）
+        try:
+            return orjson.loads(cleaned_response)
+        except json.JSONDecodeError:
+            pass
     
-    for pattern in json_block_patterns:
-        match = re.search(pattern, cleaned_response, re.DOTALL)
-        if match:
+    # 方法2: 扫描提取第一个能解析的完整 JSON 对象（兼容 markdown 代码块和前后额外文本），
+    # 找不到对象时再尝试数组
+    for opener in ('{', '['):
+        for json_str in _iter_json_spans(cleaned_response, opener):
             try:
-                json_str = match.group(1).strip()
-                return json.loads(json_str)
+                return orjson.loads(json_str)
             except json.JSONDecodeError:
                 continue
     
-    # 方法3: 尝试提取第一个 { ... } 之间的内容
-    json_start = cleaned_response.find('{')
-    if json_start >= 0:
-        json_end = cleaned_response.rfind('}')
-        if json_end > json_start:
-            json_str = cleaned_response[json_start:json_end + 1]
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                pass
-    
-    # 方法4: 尝试提取第一个 [ ... ] 之间的内容（如果是数组格式）
-    array_start = cleaned_response.find('[')
-    if array_start >= 0:
-        array_end = cleaned_response.rfind(']')
-        if array_end > array_start:
-            json_str = cleaned_response[array_start:array_end + 1]
-            try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                pass
-    
     # 如果所有方法都失败，抛出异常
     raise json.JSONDecodeError(
         f"无法解析 JSON。响应前200字符: {cleaned_response[:200]}",
@@ -84,6 +145,11 @@ def parse_llm_json_response(response: str) -> dict:
     )
 
 
+def _pretty_json(data) -> str:
+    """以两空格缩进输出 JSON 文本（保留中文原文），用于 Markdown 报告中的数据块"""
+    return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+
 def parse_agent_message_content(content: str, agent_name: str = "unknown") -> dict:
     """解析 agent 消息内容，处理格式不一致问题
     
@@ -97,20 +163,67 @@ def parse_agent_message_content(content: str, agent_name: str = "unknown") -> di
     if not content:
         return {}
     
-    # 尝试解析为 JSON
+    # 尝试解析为 JSON；orjson 不接受 NaN/Infinity，遇到这类内容时交给标准库再解析一次
     try:
         if isinstance(content, str):
-            return json.loads(content)
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                return json.loads(content)
         elif isinstance(content, dict):
             return content
         else:
             return {}
     except (json.JSONDecodeError, TypeError):
         # 如果不是 JSON，返回包含原始内容的字典
-        logger.debug(f"{agent_name} 消息不是 JSON 格式，返回原始内容")
+        logger.debug("%s 消息不是 JSON 格式，返回原始内容", agent_name)
         return {"raw_content": content}
 
 
+def _signal_to_chinese(signal_data) -> str:
+    """将信号转换为中文显示，缺少信号数据时返回“无数据”"""
+    if not signal_data:
+        return "无数据"
+    return _SIGNAL_ZH.get(signal_data.get("signal"), "中性")
+
+
+def _leaf(data, *path, default="无数据"):
+    """沿键路径取嵌套字典中的值；路径中断、值为 None 或空字符串时返回 default"""
+    for key in path:
+        if not isinstance(data, dict):
+            return default
+        data = data.get(key)
+        if data is None:
+            return default
+    return default if data == "" else data
+
+
+def _num(data, *path, default: float = 0.0) -> float:
+    """同 _leaf，用于数值字段：缺失或无法转换为数字时返回 default"""
+    value = _leaf(data, *path, default=None)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _render_report_sections(sections: list, markdown: bool) -> str:
+    """将 (标题, 正文) 章节列表渲染为报告文本
+
+    带标题的章节在控制台文本中渲染为 "1. 标题"，在 Markdown 中渲染为 "## 标题"；
+    标题为 None 的章节直接输出正文。
+    """
+    parts = []
+    number = 0
+    for heading, body in sections:
+        if heading is None:
+            parts.append(body)
+            continue
+        number += 1
+        parts.append(f"## {heading}\n{body}" if markdown else f"{number}. {heading}\n{body}")
+    return "\n\n".join(parts)
+
+
 def format_decision(action: str, quantity: int, confidence: float, agent_signals: list, reasoning: str, reasoning_zh: str = "", market_wide_news_summary: str = "未提供", raw_agent_data: dict = None) -> dict:
     """Format the trading decision into a standardized output format.
     Think in English but output analysis in Chinese."""
@@ -123,21 +236,16 @@ def format_decision(action: str, quantity: int, confidence: float, agent_signals
     # 标准化 agent_signals：统一使用 'agent_name' 键
     # LLM 可能返回 'agent' 或 'agent_name'，我们统一转换为 'agent_name'
     normalized_signals = []
+    # 只要有 'agent' 或 'agent_name' 键，就认为是有效信号；两个键都有时直接沿用原字典
     for s in agent_signals:
-        if isinstance(s, dict):
-            # 创建标准化后的字典
-            normalized_s = dict(s)  # 复制原字典
-            
-            # 如果只有 'agent' 键，添加 'agent_name' 键
-            if "agent" in normalized_s and "agent_name" not in normalized_s:
-                normalized_s["agent_name"] = normalized_s["agent"]
+        if not isinstance(s, dict):
+            continue
+        if "agent_name" in s:
             # 如果只有 'agent_name' 键但没有 'agent'，也添加 'agent' 键以保持兼容
-            elif "agent_name" in normalized_s and "agent" not in normalized_s:
-                normalized_s["agent"] = normalized_s["agent_name"]
-            
-            # 只要有 'agent' 或 'agent_name' 键，就认为是有效信号
-            if "agent_name" in normalized_s or "agent" in normalized_s:
-                normalized_signals.append(normalized_s)
+            normalized_signals.append(s if "agent" in s else {**s, "agent": s["agent_name"]})
+        elif "agent" in s:
+            # 如果只有 'agent' 键，添加 'agent_name' 键
+            normalized_signals.append({**s, "agent_name": s["agent"]})
     
     valid_signals = normalized_signals
     
@@ -145,21 +253,28 @@ def format_decision(action: str, quantity: int, confidence: float, agent_signals
     if len(valid_signals) < len(agent_signals):
         invalid_count = len(agent_signals) - len(valid_signals)
         logger.warning(f"标准化后过滤掉了 {invalid_count} 个无效的 agent_signals（总共 {len(agent_signals)} 个）")
-        logger.debug(f"标准化后的有效信号数量: {len(valid_signals)}")
-        for i, s in enumerate(valid_signals):
-            logger.debug(f"有效 signal[{i}]: agent_name={s.get('agent_name')}, signal={s.get('signal')}, confidence={s.get('confidence')}")
-
-    # 从 agent_signals 中获取信号和置信度
-    fundamental_signal_summary = next(
-        (s for s in valid_signals if s.get("agent_name") == "fundamental_analysis"), None)
-    valuation_signal_summary = next(
-        (s for s in valid_signals if s.get("agent_name") == "valuation_analysis"), None)
-    technical_signal_summary = next(
-        (s for s in valid_signals if s.get("agent_name") == "technical_analysis"), None)
-    sentiment_signal_summary = next(
-        (s for s in valid_signals if s.get("agent_name") == "sentiment_analysis"), None)
-    risk_signal_summary = next(
-        (s for s in valid_signals if s.get("agent_name") == "risk_management"), None)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("标准化后的有效信号数量: %d", len(valid_signals))
+            for i, s in enumerate(valid_signals):
+                logger.debug("有效 signal[%d]: agent_name=%s, signal=%s, confidence=%s",
+                             i, s.get('agent_name'), s.get('signal'), s.get('confidence'))
+
+    # 从 agent_signals 中获取信号和置信度（按名称建一次索引，同名时保留第一条）；
+    # 大盘新闻信号的名称不固定，LLM 可能返回 "market_wide_news_summary(沪深300指数)"
+    # 或 "macro_news_agent"，在同一趟遍历中按名称片段匹配第一条
+    signals_by_name = {}
+    market_wide_news_signal = None
+    for s in valid_signals:
+        name = s["agent_name"]
+        signals_by_name.setdefault(name, s)
+        if (market_wide_news_signal is None and isinstance(name, str)
+                and ("macro_news" in name or "market_wide" in name)):
+            market_wide_news_signal = s
+    fundamental_signal_summary = signals_by_name.get("fundamental_analysis")
+    valuation_signal_summary = signals_by_name.get("valuation_analysis")
+    technical_signal_summary = signals_by_name.get("technical_analysis")
+    sentiment_signal_summary = signals_by_name.get("sentiment_analysis")
+    risk_signal_summary = signals_by_name.get("risk_management")
     
     # 定义辅助函数（必须在使用之前定义）
     def parse_confidence(confidence_value):
@@ -217,26 +332,13 @@ def format_decision(action: str, quantity: int, confidence: float, agent_signals
         risk_signal = {**risk_signal, **risk_signal_summary}
     # Existing macro signal from macro_analyst_agent (tool-based)
     # LLM 可能返回 "selected_stock_macro_analysis" 或 "macro_analyst_agent"
-    general_macro_signal_summary = next(
-        (s for s in valid_signals if s.get("agent_name") in ["macro_analyst_agent", "selected_stock_macro_analysis"]), None)
+    general_macro_signal_summary = (signals_by_name.get("selected_stock_macro_analysis")
+                                    or signals_by_name.get("macro_analyst_agent"))
     
     general_macro_signal = raw_agent_data.get("macro_analyst", {}) if raw_agent_data else {}
     if general_macro_signal_summary:
         general_macro_signal = {**general_macro_signal, **general_macro_signal_summary}
-    # New market-wide news summary signal from macro_news_agent
-    # LLM 可能返回 "market_wide_news_summary(沪深300指数)" 或 "macro_news_agent"
-    market_wide_news_signal = next(
-        (s for s in valid_signals if s.get("agent_name") and ("macro_news" in s.get("agent_name", "") or "market_wide" in s.get("agent_name", ""))), None)
-
-    def signal_to_chinese(signal_data):
-        if not signal_data:
-            return "无数据"
-        if signal_data.get("signal") == "bullish":
-            return "看多"
-        if signal_data.get("signal") == "bearish":
-            return "看空"
-        return "中性"
-    
+
     def get_valuation_details(valuation_signal):
         """根据估值方法类型返回相应的估值详情"""
         if not valuation_signal:
@@ -342,70 +444,67 @@ def format_decision(action: str, quantity: int, confidence: float, agent_signals
         # 统一格式：每行3个空格 + "- " + 内容
         return f"   - {dcf_display}\n   - {oe_display}"
 
-    detailed_analysis = f"""
-====================================
-          投资分析报告
-====================================
-
-一、策略分析
-
-【权重说明（根据A股市场特点调整）：技术25% + 基本面20% + 估值15% + 宏观25% + 情绪15% = 100%】
-
-1. 技术分析 (权重25%):
-   信号: {signal_to_chinese(technical_signal)}
-   置信度: {((technical_signal or {}).get('confidence', 0.0) * 100):.0f}%
+    # 模板中用到的嵌套字段先取出公共前缀，叶子值统一由 _leaf/_num 取得
+    strategy_signals = _leaf(technical_signal, 'strategy_signals', default=None)
+    momentum_metrics = _leaf(strategy_signals, 'momentum', 'metrics', default=None)
+    fundamental_reasoning = _leaf(fundamental_signal, 'reasoning', default=None)
+    general_macro = general_macro_signal or {}
+    market_news = market_wide_news_signal or {}
+    sentiment = sentiment_signal or {}
+    risk_metrics = _leaf(risk_signal, 'risk_metrics', default=None)
+    action_zh = '买入' if action == 'buy' else '卖出' if action == 'sell' else '持有'
+
+    # 报告按章节组织为 (编号标题, 正文)，标题为 None 的章节原样输出；
+    # 控制台文本与 Markdown 都由这组章节直接渲染，无需事后再用正则改写
+    report_sections = [
+        (None, """一、策略分析
+
+【权重说明（根据A股市场特点调整）：技术25% + 基本面20% + 估值15% + 宏观25% + 情绪15% = 100%】"""),
+        ("技术分析 (权重25%):", f"""   信号: {_signal_to_chinese(technical_signal)}
+   置信度: {(_num(technical_signal, 'confidence') * 100):.0f}%
    要点:
-   - 趋势跟踪: ADX={((technical_signal or {}).get('strategy_signals', {}).get('trend_following', {}).get('metrics', {}).get('adx', 0.0)):.2f}
-   - 均值回归: RSI(14)={((technical_signal or {}).get('strategy_signals', {}).get('mean_reversion', {}).get('metrics', {}).get('rsi_14', 0.0)):.2f}
+   - 趋势跟踪: ADX={_num(strategy_signals, 'trend_following', 'metrics', 'adx'):.2f}
+   - 均值回归: RSI(14)={_num(strategy_signals, 'mean_reversion', 'metrics', 'rsi_14'):.2f}
    - 动量指标:
-     * 1月动量={((technical_signal or {}).get('strategy_signals', {}).get('momentum', {}).get('metrics', {}).get('momentum_1m', 0.0)):.2%}
-     * 3月动量={((technical_signal or {}).get('strategy_signals', {}).get('momentum', {}).get('metrics', {}).get('momentum_3m', 0.0)):.2%}
-     * 6月动量={((technical_signal or {}).get('strategy_signals', {}).get('momentum', {}).get('metrics', {}).get('momentum_6m', 0.0)):.2%}
-   - 波动性: {((technical_signal or {}).get('strategy_signals', {}).get('volatility', {}).get('metrics', {}).get('historical_volatility', 0.0)):.2%}
-
-2. 基本面分析 (权重20%):
-   信号: {signal_to_chinese(fundamental_signal)}
-   置信度: {((fundamental_signal or {}).get('confidence', 0.0) * 100):.0f}%
+     * 1月动量={_num(momentum_metrics, 'momentum_1m'):.2%}
+     * 3月动量={_num(momentum_metrics, 'momentum_3m'):.2%}
+     * 6月动量={_num(momentum_metrics, 'momentum_6m'):.2%}
+   - 波动性: {_num(strategy_signals, 'volatility', 'metrics', 'historical_volatility'):.2%}"""),
+        ("基本面分析 (权重20%):", f"""   信号: {_signal_to_chinese(fundamental_signal)}
+   置信度: {(_num(fundamental_signal, 'confidence') * 100):.0f}%
    要点:
-   - 盈利能力: {(fundamental_signal or {}).get('reasoning', {}).get('profitability_signal', {}).get('details', '无数据')}
-   - 增长情况: {(fundamental_signal or {}).get('reasoning', {}).get('growth_signal', {}).get('details', '无数据')}
-   - 财务健康: {(fundamental_signal or {}).get('reasoning', {}).get('financial_health_signal', {}).get('details', '无数据')}
-   - 估值水平: {(fundamental_signal or {}).get('reasoning', {}).get('price_ratios_signal', {}).get('details', '无数据')}
-
-3. 估值分析 (权重15%):
-   信号: {signal_to_chinese(valuation_signal)}
+   - 盈利能力: {_leaf(fundamental_reasoning, 'profitability_signal', 'details')}
+   - 增长情况: {_leaf(fundamental_reasoning, 'growth_signal', 'details')}
+   - 财务健康: {_leaf(fundamental_reasoning, 'financial_health_signal', 'details')}
+   - 估值水平: {_leaf(fundamental_reasoning, 'price_ratios_signal', 'details')}"""),
+        ("估值分析 (权重15%):", f"""   信号: {_signal_to_chinese(valuation_signal)}
    置信度: {parse_confidence((valuation_signal or {}).get('confidence', 0.0)) * 100:.0f}%
    要点:
-   {get_valuation_details(valuation_signal)}
-
-4. 宏观分析 (综合权重25%):
-   a) 常规宏观分析 (来自 Macro Analyst Agent):
-      信号: {signal_to_chinese(general_macro_signal)}
-      置信度: {((general_macro_signal or {}).get('confidence', 0.0) * 100):.0f}%
-      宏观环境: {(general_macro_signal or {}).get('macro_environment', '无数据')}
-      对股票影响: {(general_macro_signal or {}).get('impact_on_stock', '无数据')}
-      关键因素: {', '.join((general_macro_signal or {}).get('key_factors', ['无数据']))}
+   {get_valuation_details(valuation_signal)}"""),
+        ("宏观分析 (综合权重25%):", f"""   a) 常规宏观分析 (来自 Macro Analyst Agent):
+      信号: {_signal_to_chinese(general_macro_signal)}
+      置信度: {(_num(general_macro, 'confidence') * 100):.0f}%
+      宏观环境: {general_macro.get('macro_environment', '无数据')}
+      对股票影响: {general_macro.get('impact_on_stock', '无数据')}
+      关键因素: {', '.join(general_macro.get('key_factors', ['无数据']))}
 
    b) 大盘宏观新闻分析 (来自 Macro News Agent):
-      信号: {signal_to_chinese(market_wide_news_signal)}
-      置信度: {((market_wide_news_signal or {}).get('confidence', 0.0) * 100):.0f}%
-      摘要或结论: {(market_wide_news_signal or {}).get('reasoning', market_wide_news_summary)}
-
-5. 情绪分析 (权重15%):
-   信号: {signal_to_chinese(sentiment_signal)}
-   置信度: {((sentiment_signal or {}).get('confidence', 0.0) * 100):.0f}%
-   分析: {(sentiment_signal or {}).get('reasoning', '无详细分析')}
-
-二、风险评估
-风险评分: {(risk_signal or {}).get('risk_score', '无数据')}/10
+      信号: {_signal_to_chinese(market_wide_news_signal)}
+      置信度: {(_num(market_news, 'confidence') * 100):.0f}%
+      摘要或结论: {market_news.get('reasoning', market_wide_news_summary)}"""),
+        ("情绪分析 (权重15%):", f"""   信号: {_signal_to_chinese(sentiment_signal)}
+   置信度: {(_num(sentiment, 'confidence') * 100):.0f}%
+   分析: {sentiment.get('reasoning', '无详细分析')}"""),
+        (None, f"""二、风险评估
+风险评分: {_leaf(risk_signal, 'risk_score')}/10
 主要指标:
-- 波动率: {((risk_signal or {}).get('risk_metrics', {}).get('volatility', 0.0) * 100):.1f}%
-- 最大回撤: {((risk_signal or {}).get('risk_metrics', {}).get('max_drawdown', 0.0) * 100):.1f}%
-- VaR(95%): {((risk_signal or {}).get('risk_metrics', {}).get('value_at_risk_95', 0.0) * 100):.1f}%
-- 市场风险: {(risk_signal or {}).get('risk_metrics', {}).get('market_risk_score', '无数据')}/10
+- 波动率: {(_num(risk_metrics, 'volatility') * 100):.1f}%
+- 最大回撤: {(_num(risk_metrics, 'max_drawdown') * 100):.1f}%
+- VaR(95%): {(_num(risk_metrics, 'value_at_risk_95') * 100):.1f}%
+- 市场风险: {_leaf(risk_metrics, 'market_risk_score')}/10
 
 三、投资建议
-操作建议: {'买入' if action == 'buy' else '卖出' if action == 'sell' else '持有'}
+操作建议: {action_zh}
 交易数量: {quantity}股
 决策置信度: {confidence*100:.0f}%
 
@@ -415,19 +514,45 @@ def format_decision(action: str, quantity: int, confidence: float, agent_signals
 {reasoning_zh if reasoning_zh else '（未提供中文说明）'}
 
 ### English Explanation
-{reasoning}
+{reasoning}"""),
+    ]
 
-===================================="""
+    detailed_analysis = "".join([
+        "\n", _REPORT_BANNER, "\n\n",
+        _render_report_sections(report_sections, markdown=False),
+        "\n\n", _REPORT_RULE,
+    ])
 
     return {
         "action": action,
         "quantity": quantity,
         "confidence": confidence,
         "agent_signals": agent_signals,
-        "分析报告": detailed_analysis
+        "分析报告": detailed_analysis,
+        "report_sections": report_sections
     }
 
 
+def _get_report_executor() -> ThreadPoolExecutor:
+    """获取报告写入线程池，仅导入本模块而不生成报告时不会创建线程池"""
+    global _report_executor
+    if _report_executor is None:
+        with _report_executor_lock:
+            if _report_executor is None:
+                _report_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='portfolio-report')
+                atexit.register(_report_executor.shutdown, wait=True)
+    return _report_executor
+
+
+def _write_report(report_filepath: str, markdown_parts: List[str]):
+    """在后台线程中将 Markdown 报告片段依次写入文件"""
+    try:
+        with open(report_filepath, 'w', encoding='utf-8') as f:
+            f.writelines(markdown_parts)
+    except OSError as e:
+        logger.error(f"写入投资分析报告失败: {report_filepath}, {e}")
+
+
 def generate_portfolio_report(final_state: Dict[str, Any], show_reasoning: bool = False) -> Optional[str]:
     """生成并保存投资组合分析报告
     
@@ -446,18 +571,23 @@ def generate_portfolio_report(final_state: Dict[str, Any], show_reasoning: bool
             logger.warning("无法获取投资组合决策详情，跳过报告生成")
             return None
         
-        # 解析决策 JSON
-        agent_reasoning = final_state.get("metadata", {}).get("agent_reasoning", "")
-        if not agent_reasoning:
-            logger.warning("无法获取 agent_reasoning，跳过报告生成")
-            return None
-        
-        try:
-            # 使用 parse_llm_json_response 来处理可能包含 markdown 代码块的响应
-            decision_json = parse_llm_json_response(agent_reasoning)
-        except (json.JSONDecodeError, TypeError) as e:
-            logger.warning(f"无法解析 agent_reasoning 为 JSON: {str(e)}")
-            logger.debug(f"agent_reasoning 前500字符: {agent_reasoning[:500]}")
+        # 优先使用 portfolio_management_agent 已解析好的决策，否则解析决策 JSON
+        decision_json = final_state.get("data", {}).get("portfolio_decision")
+        if decision_json is None:
+            agent_reasoning = final_state.get("metadata", {}).get("agent_reasoning", "")
+            if not agent_reasoning:
+                logger.warning("无法获取 agent_reasoning，跳过报告生成")
+                return None
+            
+            try:
+                # 使用 parse_llm_json_response 来处理可能包含 markdown 代码块的响应
+                decision_json = parse_llm_json_response(agent_reasoning)
+            except (json.JSONDecodeError, TypeError) as e:
+                logger.warning(f"无法解析 agent_reasoning 为 JSON: {str(e)}")
+                logger.debug("agent_reasoning 前500字符: %s", agent_reasoning[:500])
+                return None
+        if not isinstance(decision_json, dict):
+            logger.warning("决策 JSON 不是对象，跳过报告生成")
             return None
         
         action = decision_json.get("action", "hold")
@@ -471,30 +601,29 @@ def generate_portfolio_report(final_state: Dict[str, Any], show_reasoning: bool
         market_wide_news_summary = final_state.get("data", {}).get(
             "macro_news_analysis_result", "大盘宏观新闻分析不可用或未提供。")
         
-        # 收集原始 agent 数据
+        # 倒序遍历一次，每个 agent 只解析最新的一条有效消息；
+        # 报告数据与详细推理部分共用解析结果，不再重复解析
         messages = final_state.get("messages", [])
-        raw_agent_data = {}
-        
-        # 从消息中提取各个 agent 的数据
-        agent_name_map = {
-            "technical_analyst_agent": "technical",
-            "fundamentals_agent": "fundamentals",
-            "sentiment_agent": "sentiment",
-            "valuation_agent": "valuation",
-            "valuation_agent_v2": "valuation",  # 支持V2版本的估值代理
-            "risk_management_agent": "risk",
-            "macro_analyst_agent": "macro_analyst",
-        }
-        
-        for msg in messages:
+        parsed_by_name = {}
+        for msg in reversed(messages):
             agent_name = msg.name
-            if agent_name in agent_name_map:
-                try:
-                    agent_data = parse_agent_message_content(msg.content, agent_name)
-                    if agent_data:
-                        raw_agent_data[agent_name_map[agent_name]] = agent_data
-                except Exception as e:
-                    logger.debug(f"解析 {agent_name} 的数据时出错: {e}")
+            if agent_name in parsed_by_name:
+                continue
+            if agent_name not in _RAW_DATA_KEYS and not (show_reasoning and agent_name in _AGENT_DISPLAY_NAMES):
+                continue
+            try:
+                agent_data = parse_agent_message_content(msg.content, agent_name)
+                if agent_data:
+                    parsed_by_name[agent_name] = agent_data
+            except Exception as e:
+                logger.debug("解析 %s 的数据时出错: %s", agent_name, e)
+        
+        # 收集原始 agent 数据（parsed_by_name 按消息从新到旧排列，同类 agent 取最新的一条）
+        raw_agent_data = {}
+        for agent_name, agent_data in parsed_by_name.items():
+            data_key = _RAW_DATA_KEYS.get(agent_name)
+            if data_key is not None and data_key not in raw_agent_data:
+                raw_agent_data[data_key] = agent_data
         
         # 格式化报告
         formatted_report = format_decision(
@@ -520,9 +649,12 @@ def generate_portfolio_report(final_state: Dict[str, Any], show_reasoning: bool
         logger.info("="*60 + "\n")
         
         if show_reasoning:
-            show_agent_reasoning("portfolio_management_agent", formatted_report["分析报告"])
+            show_agent_reasoning(formatted_report["分析报告"], "portfolio_management_agent")
         
-        # 生成并保存 Markdown 文件
+        # 生成并保存 Markdown 文件（仅此分支需要的模块在这里导入）
+        import os
+        from datetime import datetime
+
         ticker = final_state.get("data", {}).get("ticker", "UNKNOWN")
         stock_name = final_state.get("data", {}).get("stock_name", "")
         if not stock_name:
@@ -544,108 +676,59 @@ def generate_portfolio_report(final_state: Dict[str, Any], show_reasoning: bool
         
         report_filepath = os.path.join(reports_dir, report_filename)
         
-        # 构建 Markdown 内容
-        report_text = formatted_report["分析报告"]
-        # 将等号分隔线转换为 markdown 分隔线
-        report_text = re.sub(r'={60,}', '---', report_text)
-        # 将文本中的标题转换为 markdown 标题
-        report_text = re.sub(r'^(\d+[\.、])\s*(.+)$', r'## \2', report_text, flags=re.MULTILINE)
+        # 构建 Markdown 内容：直接由报告章节渲染，不再对控制台文本做正则替换
+        report_text = _render_report_sections(formatted_report["report_sections"], markdown=True)
+        
+        # 构建股票名称行（如果有的话）
+        stock_name_line = f"- **股票名称**: {stock_name}\n" if stock_name else ""
         
-        # 如果启用了 show_reasoning，收集所有 agent 的详细推理信息
-        detailed_reasoning_section = ""
+        # Markdown 内容按片段收集，由写入线程逐段写入文件，不再拼接成一个完整字符串
+        action_zh = '买入' if action == 'buy' else '卖出' if action == 'sell' else '持有'
+        now = datetime.now()
+        markdown_parts = [
+            "# 投资分析报告\n\n## 基本信息\n\n",
+            f"- **股票代码**: {ticker}\n",
+            stock_name_line,
+            f"- **分析日期**: {now.strftime('%Y年%m月%d日')}\n",
+            f"- **报告生成时间**: {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n---\n\n",
+            report_text,
+            "\n\n---\n\n## 最终决策\n\n",
+            f"- **操作建议**: {action_zh}\n",
+            f"- **交易数量**: {quantity} 股\n",
+            f"- **决策置信度**: {confidence*100:.1f}%\n\n",
+            "## 原始决策数据\n\n<details>\n<summary>点击查看原始 JSON 数据</summary>\n\n```json\n",
+            _pretty_json(decision_json),
+            "\n```\n\n</details>\n",
+        ]
+        
+        # 如果启用了 show_reasoning，追加所有 agent 的详细推理信息
         if show_reasoning:
+            # 复用前面的解析结果，按消息先后顺序输出各个 agent 的详细数据
             detailed_reasoning_parts = []
-            
-            # Agent 名称映射（中文显示名称）
-            agent_display_name_map = {
-                "technical_analyst_agent": "技术分析师",
-                "fundamentals_agent": "基本面分析师",
-                "sentiment_agent": "情绪分析师",
-                "valuation_agent": "估值分析师",
-                "valuation_agent_v2": "估值分析师（V2）",  # 支持V2版本的估值代理
-                "risk_management_agent": "风险管理专家",
-                "macro_analyst_agent": "宏观分析师",
-                "macro_news_agent": "宏观新闻分析师",
-                "researcher_bull_agent": "看多研究员",
-                "researcher_bear_agent": "看空研究员",
-                "debate_room_agent": "辩论室"
-            }
-            
-            # 收集各个 agent 的详细数据
-            for msg in messages:
-                agent_name = msg.name
-                if agent_name and agent_name in agent_display_name_map:
-                    try:
-                        # 解析消息内容
-                        agent_data = parse_agent_message_content(msg.content, agent_name)
-                        if agent_data:
-                            display_name = agent_display_name_map.get(agent_name, agent_name)
-                            detailed_reasoning_parts.append(f"""
-### {display_name} ({agent_name})
-
-```json
-{json.dumps(agent_data, ensure_ascii=False, indent=2)}
-```
-""")
-                    except Exception as e:
-                        logger.debug(f"解析 {agent_name} 的详细推理信息时出错: {e}")
+            for agent_name, agent_data in reversed(list(parsed_by_name.items())):
+                display_name = _AGENT_DISPLAY_NAMES.get(agent_name)
+                if display_name is None:
+                    continue
+                detailed_reasoning_parts += [
+                    f"\n### {display_name} ({agent_name})\n\n```json\n",
+                    _pretty_json(agent_data),
+                    "\n```\n",
+                ]
             
             if detailed_reasoning_parts:
-                detailed_reasoning_section = f"""
-
----
-
-## 详细推理信息
-
-> 以下内容包含各个分析 Agent 的完整推理过程和详细数据，仅在启用 `--show-reasoning` 参数时显示。
-
-{''.join(detailed_reasoning_parts)}
-"""
-        
-        # 构建股票名称行（如果有的话）
-        stock_name_line = f"- **股票名称**: {stock_name}\n" if stock_name else ""
+                markdown_parts.append(
+                    "\n\n---\n\n## 详细推理信息\n\n"
+                    "> 以下内容包含各个分析 Agent 的完整推理过程和详细数据，仅在启用 `--show-reasoning` 参数时显示。\n\n")
+                markdown_parts += detailed_reasoning_parts
+                markdown_parts.append("\n")
         
-        markdown_content = f"""# 投资分析报告
-
-## 基本信息
-
-- **股票代码**: {ticker}
-{stock_name_line}- **分析日期**: {datetime.now().strftime("%Y年%m月%d日")}
-- **报告生成时间**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
----
-
-{report_text}
-
----
-
-## 最终决策
-
-- **操作建议**: {'买入' if action == 'buy' else '卖出' if action == 'sell' else '持有'}
-- **交易数量**: {quantity} 股
-- **决策置信度**: {confidence*100:.1f}%
-
-## 原始决策数据
-
-<details>
-<summary>点击查看原始 JSON 数据</summary>
-
-```json
-{json.dumps(decision_json, ensure_ascii=False, indent=2)}
-```
-
-</details>
-{detailed_reasoning_section}
----
-
-*本报告由 AI 投资分析系统自动生成，仅供参考，不构成投资建议。市场有风险，投资需谨慎。*
-"""
+        markdown_parts.append(
+            "\n---\n\n*本报告由 AI 投资分析系统自动生成，仅供参考，不构成投资建议。市场有风险，投资需谨慎。*\n")
         
-        # 保存文件
-        with open(report_filepath, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        # 保存文件：写盘交给后台线程，不阻塞工作流返回
+        _get_report_executor().submit(_write_report, report_filepath, markdown_parts)
         
-        logger.info(f"✅ 投资分析报告已保存至: {report_filepath}")
+        logger.info(f"✅ 投资分析报告正在保存至: {report_filepath}")
         return report_filepath
         
     except Exception as e:
@@ -0,0 +1,170 @@
+"""研究员论点构建工具模块
+
+多方、空方研究员共用的论点生成逻辑：按固定顺序检查各分析师信号，
+信号与研究员立场一致时引用其置信度，否则给出反向解读和默认置信度。
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import orjson
+
+# 研究员读取的分析师消息：(信号键, 按优先级排列的 agent 名称)，顺序与 _THESIS_SPECS 一致
+ANALYST_SOURCES = (
+    ("technical", ("technical_analyst_agent",)),
+    ("fundamental", ("fundamentals_agent",)),
+    ("sentiment", ("sentiment_agent",)),
+    # 支持valuation_agent和valuation_agent_v2
+    ("valuation", ("valuation_agent_v2", "valuation_agent")),
+)
+
+# 信号与立场不一致时，反向解读使用的默认置信度
+_CONTRARIAN_CONFIDENCE = 0.3
+
+# 各立场消息中的总体说明
+_THESIS_REASONING = {
+    "bullish": "Bullish thesis based on comprehensive analysis of technical, fundamental, sentiment, and valuation factors",
+    "bearish": "Bearish thesis based on comprehensive analysis of technical, fundamental, sentiment, and valuation factors",
+}
+
+# 各立场的论点模板：(信号键, 立场一致时的论点, 立场不一致时的反向解读)
+_THESIS_SPECS = {
+    "bullish": (
+        ("technical",
+         "Technical indicators show bullish momentum with {} confidence",
+         "Technical indicators may be conservative, presenting buying opportunities"),
+        ("fundamental",
+         "Strong fundamentals with {} confidence",
+         "Company fundamentals show potential for improvement"),
+        ("sentiment",
+         "Positive market sentiment with {} confidence",
+         "Market sentiment may be overly pessimistic, creating value opportunities"),
+        ("valuation",
+         "Stock appears undervalued with {} confidence",
+         "Current valuation may not fully reflect growth potential"),
+    ),
+    "bearish": (
+        ("technical",
+         "Technical indicators show bearish momentum with {} confidence",
+         "Technical rally may be temporary, suggesting potential reversal"),
+        ("fundamental",
+         "Concerning fundamentals with {} confidence",
+         "Current fundamental strength may not be sustainable"),
+        ("sentiment",
+         "Negative market sentiment with {} confidence",
+         "Market sentiment may be overly optimistic, indicating potential risks"),
+        ("valuation",
+         "Stock appears overvalued with {} confidence",
+         "Current valuation may not fully reflect downside risks"),
+    ),
+}
+
+
+def find_analyst_messages(messages) -> Dict[str, Any]:
+    """按 ANALYST_SOURCES 查找各分析师的消息，同名消息保留最早的一条
+
+    Returns:
+        信号键到消息的映射，未找到的消息为 None
+    """
+    msgs_by_name = {}
+    for msg in messages:
+        msgs_by_name.setdefault(msg.name, msg)
+    found = {}
+    for key, names in ANALYST_SOURCES:
+        found[key] = None
+        for name in names:
+            if name in msgs_by_name:
+                found[key] = msgs_by_name[name]
+                break
+    return found
+
+
+@lru_cache(maxsize=128)
+def _cached_loads(content: str):
+    """按内容缓存的 JSON 解析，解析失败时抛出异常（异常不会被缓存）"""
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return json.loads(content)
+
+
+def loads_signal(content: str):
+    """解析分析师消息的 JSON 内容
+
+    优先使用 orjson；orjson 不接受 NaN/Infinity，遇到这类内容时交给标准库再解析一次。
+    多方、空方研究员解析的是同一批消息，字符串内容按值缓存，第二个研究员直接命中；
+    返回的对象在多次调用间共享，调用方只读取不修改。
+
+    Raises:
+        json.JSONDecodeError: 内容不是合法 JSON
+    """
+    if isinstance(content, str):
+        return _cached_loads(content)
+    return orjson.loads(content)
+
+
+@lru_cache(maxsize=512)
+def _parse_confidence(confidence: str) -> float:
+    """将 "85%" 形式的置信度转换为 0-1 的小数；多方、空方会解析同一批取值，按字符串缓存"""
+    return float(confidence.replace("%", "")) / 100
+
+
+def build_thesis(signals: Dict[str, dict], perspective: str) -> Tuple[List[str], List[float]]:
+    """从指定立场构建论点列表及对应的置信度
+
+    Args:
+        signals: 信号键（technical/fundamental/sentiment/valuation）到分析师信号的映射
+        perspective: 研究员立场，"bullish" 或 "bearish"
+
+    Returns:
+        (论点列表, 置信度列表)，顺序与 _THESIS_SPECS 一致
+    """
+    points = []
+    scores = []
+    for key, agreeing, contrarian in _THESIS_SPECS[perspective]:
+        signal = signals[key]
+        if signal["signal"] == perspective:
+            # 论点文本与置信度解析共用同一份字符串形式
+            confidence = str(signal["confidence"])
+            points.append(agreeing.format(confidence))
+            scores.append(_parse_confidence(confidence))
+        else:
+            points.append(contrarian)
+            scores.append(_CONTRARIAN_CONFIDENCE)
+    return points, scores
+
+
+@lru_cache(maxsize=64)
+def _cached_thesis_message(perspective: str, signal_pairs: tuple) -> Tuple[dict, str]:
+    """按 (立场, 各信号的 (signal, confidence)) 缓存研究员消息内容及其 JSON 文本"""
+    signals = {
+        key: {"signal": signal, "confidence": confidence}
+        for (key, _, _), (signal, confidence) in zip(_THESIS_SPECS[perspective], signal_pairs)
+    }
+    points, scores = build_thesis(signals, perspective)
+    content = {
+        "perspective": perspective,
+        "confidence": sum(scores) / len(scores),
+        "thesis_points": points,
+        "reasoning": _THESIS_REASONING[perspective],
+    }
+    return content, orjson.dumps(content).decode()
+
+
+def thesis_message(signals: Dict[str, dict], perspective: str) -> Tuple[dict, str]:
+    """构建研究员的消息内容及其 JSON 文本，输入信号未变化时直接复用缓存的结果
+
+    Args:
+        signals: 同 build_thesis
+        perspective: 研究员立场，"bullish" 或 "bearish"
+
+    Returns:
+        (消息内容字典, JSON 文本)；字典为新副本，调用方可自由修改
+    """
+    signal_pairs = tuple(
+        (signals[key]["signal"], str(signals[key]["confidence"]))
+        for key, _, _ in _THESIS_SPECS[perspective]
+    )
+    content, content_json = _cached_thesis_message(perspective, signal_pairs)
+    return {**content, "thesis_points": list(content["thesis_points"])}, content_json
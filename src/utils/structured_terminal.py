@@ -304,6 +304,10 @@ def extract_agent_data(state: Dict[str, Any], agent_name: str) -> Any:
     """
     # 特殊处理portfolio_management_agent
     if agent_name == "portfolio_management_agent":
+        # 优先使用已解析好的决策
+        decision = state.get("data", {}).get("portfolio_decision")
+        if decision is not None:
+            return decision
         # 尝试从最后一条消息中获取数据
         messages = state.get("messages", [])
         if messages and hasattr(messages[-1], "content"):
@@ -0,0 +1,56 @@
+"""
+OpenAI 兼容客户端测试
+
+服务商拒绝 response_format 后，同一模型的后续请求不再携带该参数
+"""
+
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import BadRequestError
+
+from src.utils.llm_clients import OpenAICompatibleClient
+
+RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "decision", "schema": {}}}
+
+
+def _bad_request():
+    request = httpx.Request("POST", "https://example.invalid/v1/chat/completions")
+    return BadRequestError(
+        "response_format not supported",
+        response=httpx.Response(400, request=request),
+        body=None,
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(OpenAICompatibleClient, "_response_format_unsupported", set())
+    client = OpenAICompatibleClient(
+        api_key="test-key", base_url="https://example.invalid/v1", model="test-model")
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        if "response_format" in kwargs:
+            raise _bad_request()
+        message = SimpleNamespace(content='{"action": "hold"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(client.client.chat.completions, "create", create)
+    client.calls = calls
+    return client
+
+
+def test_rejected_response_format_is_not_sent_again(client):
+    messages = [{"role": "user", "content": "decide"}]
+    assert client.get_completion(messages, response_format=RESPONSE_FORMAT) == '{"action": "hold"}'
+    assert ["response_format" in call for call in client.calls] == [True, False]
+
+    # 新建的同一模型客户端直接发送普通请求，不再先付出一次 400
+    second = OpenAICompatibleClient(
+        api_key="test-key", base_url="https://example.invalid/v1", model="test-model")
+    second.client.chat.completions.create = client.client.chat.completions.create
+    assert second.get_completion(messages, response_format=RESPONSE_FORMAT) == '{"action": "hold"}'
+    assert ["response_format" in call for call in client.calls] == [True, False, False]
@@ -0,0 +1,76 @@
+"""
+投资组合决策磁盘缓存测试
+
+缓存文件数量和有效期有上限，并发删除等文件系统错误不会中断决策流程
+"""
+
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.agents import portfolio_manager as pm  # noqa: E402
+
+VALID_DECISION = (
+    '{"action": "hold", "quantity": 0, "confidence": 0.5, '
+    '"agent_signals": [], "reasoning": "ok"}'
+)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pm, "_DECISION_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_cache_dir_is_independent_of_cwd():
+    assert os.path.isabs(pm._DECISION_CACHE_DIR)
+
+
+def test_save_prunes_oldest_entries_beyond_limit(cache_dir, monkeypatch):
+    monkeypatch.setattr(pm, "_DECISION_CACHE_MAX_FILES", 3)
+    now = time.time()
+    for i in range(5):
+        path = cache_dir / f"{i}.json"
+        path.write_text(VALID_DECISION, encoding="utf-8")
+        os.utime(path, (now - 100 + i, now - 100 + i))
+
+    pm._save_cached_decision(str(cache_dir / "new.json"), VALID_DECISION)
+
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["3.json", "4.json", "new.json"]
+
+
+def test_expired_entry_is_ignored_and_removed(cache_dir):
+    path = cache_dir / "old.json"
+    path.write_text(VALID_DECISION, encoding="utf-8")
+    expired = time.time() - pm._DECISION_CACHE_TTL - 60
+    os.utime(path, (expired, expired))
+
+    assert pm._load_cached_decision(str(path)) == (None, None)
+    assert not path.exists()
+
+
+def test_valid_entry_is_loaded(cache_dir):
+    path = cache_dir / "ok.json"
+    path.write_text(VALID_DECISION, encoding="utf-8")
+
+    content, decision = pm._load_cached_decision(str(path))
+    assert content == VALID_DECISION
+    assert decision.action == "hold"
+
+
+def test_invalid_entry_removed_even_if_already_gone(cache_dir, monkeypatch):
+    path = cache_dir / "bad.json"
+    path.write_text('{"action": "maybe"}', encoding="utf-8")
+
+    def concurrent_remove(p):
+        raise FileNotFoundError(p)
+
+    monkeypatch.setattr(pm.os, "remove", concurrent_remove)
+    assert pm._load_cached_decision(str(path)) == (None, None)
+
+
+def test_missing_entry(cache_dir):
+    assert pm._load_cached_decision(str(cache_dir / "missing.json")) == (None, None)
@@ -0,0 +1,64 @@
+"""
+LLM 响应及 agent 消息的 JSON 解析测试
+
+覆盖 markdown 代码块、前后说明文字，以及说明文字中夹带括号的情况
+"""
+
+import json
+import math
+
+import pytest
+
+from src.utils.portfolio_report import parse_agent_message_content, parse_llm_json_response
+
+
+def test_plain_json():
+    assert parse_llm_json_response('{"action": "buy", "quantity": 100}') == {
+        "action": "buy", "quantity": 100}
+
+
+def test_json_in_fence_with_trailing_text():
+    response = '```json\n{"action": "sell", "reasoning": "a } in a string"}\n```\n以上为决策。'
+    assert parse_llm_json_response(response) == {
+        "action": "sell", "reasoning": "a } in a string"}
+
+
+def test_prose_with_braces_before_fence():
+    response = (
+        "Weighing {technical, valuation} vs {fundamentals}, my decision:\n"
+        "```json\n"
+        '{"action": "buy", "quantity": 100, "confidence": 0.7,\n'
+        ' "agent_signals": [{"agent_name": "technical_analysis", "signal": "bullish", "confidence": 0.8}],\n'
+        ' "reasoning": "ok"}\n'
+        "```"
+    )
+    result = parse_llm_json_response(response)
+    assert isinstance(result, dict)
+    assert result["action"] == "buy"
+    assert result["agent_signals"][0]["signal"] == "bullish"
+
+
+def test_unbalanced_brace_in_prose_before_json():
+    response = 'Note: the { was a typo. {"action": "hold", "quantity": 0}'
+    assert parse_llm_json_response(response) == {"action": "hold", "quantity": 0}
+
+
+def test_array_fallback():
+    assert parse_llm_json_response("signals: [1, 2, 3] done") == [1, 2, 3]
+
+
+@pytest.mark.parametrize("response", ["", "no json here", "{not json} and {still not}"])
+def test_unparseable_raises(response):
+    with pytest.raises(json.JSONDecodeError):
+        parse_llm_json_response(response)
+
+
+def test_agent_message_with_nan_is_parsed():
+    content = json.dumps({"signal": "bullish", "metrics": {"historical_volatility": float("nan")}})
+    result = parse_agent_message_content(content, "technical_analyst_agent")
+    assert result["signal"] == "bullish"
+    assert math.isnan(result["metrics"]["historical_volatility"])
+
+
+def test_agent_message_plain_text_kept_as_raw_content():
+    assert parse_agent_message_content("not json", "x") == {"raw_content": "not json"}
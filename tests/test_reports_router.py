@@ -0,0 +1,55 @@
+"""
+历史报告路由测试
+
+报告文件名中含股票中文名，读取和下载接口需要接受这类文件名，同时拒绝路径遍历
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import reports
+
+CHINESE_REPORT = "2025-12-11-600330-白云山.md"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / CHINESE_REPORT).write_text("# 白云山 分析报告\n", encoding="utf-8")
+    monkeypatch.setattr(reports, "get_reports_dir", lambda: str(tmp_path))
+    app = FastAPI()
+    app.include_router(reports.router)
+    return TestClient(app)
+
+
+def test_get_report_with_chinese_filename(client):
+    resp = client.get(f"/reports/{CHINESE_REPORT}")
+    assert resp.status_code == 200
+    assert resp.json()["data"]["content"] == "# 白云山 分析报告\n"
+
+
+def test_download_report_with_chinese_filename(client):
+    resp = client.get(f"/reports/{CHINESE_REPORT}/download")
+    assert resp.status_code == 200
+    assert resp.text == "# 白云山 分析报告\n"
+
+
+@pytest.mark.parametrize("filename", ["..白云山.md", "a..md", "a\\b.md", "白云山.txt"])
+def test_invalid_filenames_rejected(filename):
+    with pytest.raises(reports.HTTPException) as exc_info:
+        reports._validate_filename(filename)
+    assert exc_info.value.status_code == 400
+
+
+def test_new_report_listed_immediately_through_app_middleware(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    from backend.main import app
+
+    monkeypatch.setattr(reports, "get_reports_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(reports, "_cache", {"mtime": None, "data": None})
+    client = TestClient(app)
+
+    assert client.get("/reports/").json()["data"] == []
+    (tmp_path / CHINESE_REPORT).write_text("# 白云山 分析报告\n", encoding="utf-8")
+    listed = [r["filename"] for r in client.get("/reports/").json()["data"]]
+    assert listed == [CHINESE_REPORT]
@@ -0,0 +1,100 @@
+"""
+风险指标计算测试
+
+NumPy 实现的风险指标需与原先基于 pandas 的计算结果一致，
+覆盖前导缺失值、数据少于滚动窗口以及只有两个价格点的情况
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from src.agents import risk_manager as rm  # noqa: E402
+
+
+def _pandas_risk_metrics(close: pd.Series):
+    """原先 risk_management_agent 中基于 pandas 的风险指标计算"""
+    returns = close.pct_change().dropna()
+    if len(returns) == 0:
+        volatility = var_95 = volatility_percentile = 0.0
+    else:
+        daily_vol = returns.std()
+        volatility = daily_vol * (252 ** 0.5) if not math.isnan(daily_vol) else 0.0
+        rolling_std = returns.rolling(window=min(120, len(returns))).std() * (252 ** 0.5)
+        volatility_mean = rolling_std.mean()
+        volatility_std = rolling_std.std()
+        if not math.isnan(volatility_mean) and not math.isnan(volatility_std) and volatility_std > 0:
+            volatility_percentile = (volatility - volatility_mean) / volatility_std
+        else:
+            volatility_percentile = 0.0
+        var_95 = returns.quantile(0.05)
+        if math.isnan(var_95):
+            var_95 = 0.0
+
+    window = 60 if len(close) >= 60 else len(close)
+    max_drawdown = (close / close.rolling(window=window).max() - 1).min()
+    if math.isnan(max_drawdown):
+        max_drawdown = 0.0
+    return volatility, var_95, max_drawdown, volatility_percentile
+
+
+def _numpy_risk_metrics(close: pd.Series):
+    """与 risk_management_agent 相同的调用方式，并做同样的有限值检查"""
+    metrics = rm._compute_risk_metrics(close.ffill().to_numpy(dtype=np.float64))
+    return tuple(float(x) if math.isfinite(x) else 0.0 for x in metrics)
+
+
+def _random_walk(rng, n, leading_nan=0):
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    close[:leading_nan] = np.nan
+    return pd.Series(close)
+
+
+CASES = [(n, leading_nan)
+         for n in (2, 3, 5, 30, 59, 60, 61, 119, 120, 121, 122, 250, 1000)
+         for leading_nan in (0, 1, 3)
+         if leading_nan < n]
+
+
+@pytest.mark.parametrize("n,leading_nan", CASES)
+def test_matches_pandas(n, leading_nan):
+    rng = np.random.default_rng(n * 10 + leading_nan)
+    for _ in range(20):
+        close = _random_walk(rng, n, leading_nan)
+        expected = _pandas_risk_metrics(close)
+        actual = _numpy_risk_metrics(close)
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+def test_fuzz_matches_pandas():
+    rng = np.random.default_rng(0)
+    for _ in range(3000):
+        n = int(rng.integers(2, 400))
+        close = _random_walk(rng, n, int(rng.integers(0, min(n, 5))))
+        assert _numpy_risk_metrics(close) == pytest.approx(
+            _pandas_risk_metrics(close), rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize("n", range(1, 150))
+def test_rolling_max_matches_pandas_with_nan(n):
+    rng = np.random.default_rng(n)
+    values = rng.normal(size=n)
+    if n > 4:
+        values[rng.integers(0, n, 2)] = np.nan
+    for window in {w for w in (1, 2, 3, 7, min(60, n), n) if w <= n}:
+        expected = pd.Series(values).rolling(window).max().to_numpy()[window - 1:]
+        np.testing.assert_array_equal(rm._rolling_max(values, window), expected)
+
+
+@pytest.mark.parametrize("n", [2, 3, 10, 121, 500])
+def test_rolling_std_and_quantile_match_pandas(n):
+    returns = np.random.default_rng(n).normal(0, 0.02, n)
+    window = min(120, n)
+    expected_std = pd.Series(returns).rolling(window).std().to_numpy()[window - 1:]
+    np.testing.assert_allclose(rm._rolling_std(returns, window), expected_std, rtol=1e-9, atol=1e-15)
+    assert rm._quantile(returns, 0.05) == pytest.approx(pd.Series(returns).quantile(0.05), rel=1e-12)